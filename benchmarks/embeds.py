@@ -0,0 +1,93 @@
+"""
+Micro-benchmark for building reply embeds, comparing the old create_default_embed with the template layer.
+
+Run from the repository root with `python -m benchmarks.embeds`.
+"""
+import timeit
+from datetime import datetime
+from types import SimpleNamespace
+
+import discord
+
+from utils.embeds import EmbedTemplate, render_embed
+
+NUMBER = 20000
+
+
+class FakeUser:
+    """Just enough of a discord.User to build its avatar URL the same way discord.py does."""
+
+    def __init__(self, user_id, name, avatar):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.avatar = avatar
+
+    @property
+    def mention(self):
+        return f'<@{self.id}>'
+
+    def is_avatar_animated(self):
+        return bool(self.avatar and self.avatar.startswith('a_'))
+
+    @property
+    def avatar_url(self):
+        return discord.Asset._from_avatar(None, self)
+
+
+def make_context():
+    author = FakeUser(175386962364989440, 'Dr Turtle', 'a1b2c3d4e5f6a7b8c9d0e1f2a3b4c5d6')
+    bot_user = FakeUser(770000000000000000, 'Poddo', 'f6e5d4c3b2a1f6e5d4c3b2a1f6e5d4c3')
+    return SimpleNamespace(message=SimpleNamespace(author=author), bot=SimpleNamespace(user=bot_user), prefix='-')
+
+
+def old_create_default_embed(ctx, **options) -> discord.Embed:
+    # create_default_embed before the template layer
+    embed = discord.Embed(color=discord.Color(int('0x2F3136', base=16)), **options)
+    bot = ctx.bot
+    embed.set_author(name=ctx.message.author.display_name, icon_url=str(ctx.message.author.avatar_url))
+    embed.set_footer(text=bot.user.name, icon_url=str(bot.user.avatar_url))
+    embed.timestamp = datetime.utcnow()
+    return embed
+
+
+ERROR_TEMPLATE = EmbedTemplate('Invalid Argument!', 'Error: {error}', discord.Colour.red())
+
+
+def old_error_embed(ctx):
+    embed = old_create_default_embed(ctx, colour=discord.Colour.red())
+    embed.title = 'Invalid Argument!'
+    embed.description = 'Error: ' + 'Converting to "int" failed for parameter "amount".'
+    return embed
+
+
+def new_error_embed(ctx):
+    return ERROR_TEMPLATE.render(ctx, error='Converting to "int" failed for parameter "amount".')
+
+
+CASES = {
+    'default_embed': (old_create_default_embed, render_embed),
+    'error_embed': (old_error_embed, new_error_embed),
+}
+
+
+def run(number: int = NUMBER) -> dict:
+    """
+    Times every case.
+    :return: case name -> {'old': seconds per call, 'new': seconds per call}
+    """
+    ctx = make_context()
+    results = {}
+    for name, (old, new) in CASES.items():
+        assert old(ctx).to_dict().keys() == new(ctx).to_dict().keys()
+        results[name] = {
+            'old': min(timeit.repeat(lambda: old(ctx), number=number, repeat=3)) / number,
+            'new': min(timeit.repeat(lambda: new(ctx), number=number, repeat=3)) / number,
+        }
+    return results
+
+
+if __name__ == '__main__':
+    for case, timings in run().items():
+        print(f'{case:<15} old {timings["old"] * 1e6:7.2f} us   new {timings["new"] * 1e6:7.2f} us   '
+              f'({timings["old"] / timings["new"]:.1f}x)')
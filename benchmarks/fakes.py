@@ -0,0 +1,194 @@
+"""
+In-memory stand-ins for the parts of Motor the bot uses, so benchmarks run without a Mongo server.
+
+Queries only support equality and comparisons on top level fields, which is all the bot needs. Every call still
+goes through the event loop like the real client, so awaits cost what they would minus the network.
+"""
+import asyncio
+import copy
+
+from bson import ObjectId
+from pymongo import DeleteOne
+from pymongo.errors import OperationFailure
+from pymongo.results import BulkWriteResult, DeleteResult, InsertOneResult, UpdateResult
+
+from utils.prefixes import CHANGE_STREAM_UNSUPPORTED
+
+
+OPERATORS = {
+    '$gt': lambda a, b: a is not None and a > b,
+    '$gte': lambda a, b: a is not None and a >= b,
+    '$lt': lambda a, b: a is not None and a < b,
+    '$lte': lambda a, b: a is not None and a <= b,
+    '$ne': lambda a, b: a != b,
+}
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, value in query.items():
+        if isinstance(value, dict) and value and all(x in OPERATORS for x in value):
+            if not all(OPERATORS[op](doc.get(key), operand) for op, operand in value.items()):
+                return False
+        elif doc.get(key) != value:
+            return False
+    return True
+
+
+def _project(doc: dict, projection) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    fields = {key for key, include in projection.items() if include}
+    fields.add('_id')
+    return {key: copy.deepcopy(value) for key, value in doc.items() if key in fields}
+
+
+def _apply_update(doc: dict, update: dict):
+    for key, value in update.get('$set', {}).items():
+        doc[key] = value
+    for key, value in update.get('$inc', {}).items():
+        doc[key] = doc.get(key, 0) + value
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._docs = docs
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def limit(self, amount):
+        self._docs = self._docs[:amount] if amount else self._docs
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._docs:
+            yield doc
+
+    async def to_list(self, length=None):
+        return self._docs[:length] if length else list(self._docs)
+
+
+class FakeCollection:
+    def __init__(self, name: str = 'collection', docs=None):
+        """
+        A Motor collection backed by a list.
+        :param str name: The collection name.
+        :param docs: Documents to start with.
+        """
+        self.name = name
+        self.docs = []
+        for doc in docs or []:
+            self._insert(doc)
+
+    def _insert(self, doc: dict) -> dict:
+        doc = copy.deepcopy(doc)
+        doc.setdefault('_id', ObjectId())
+        self.docs.append(doc)
+        return doc
+
+    def _first(self, query: dict):
+        return next((doc for doc in self.docs if _matches(doc, query)), None)
+
+    async def find_one(self, query: dict = None, projection=None):
+        await asyncio.sleep(0)
+        doc = self._first(query or {})
+        return None if doc is None else _project(doc, projection)
+
+    def find(self, query: dict = None, projection=None, **kwargs):
+        return FakeCursor([_project(doc, projection) for doc in self.docs if _matches(doc, query or {})])
+
+    async def insert_one(self, doc: dict):
+        await asyncio.sleep(0)
+        return InsertOneResult(self._insert(doc)['_id'], acknowledged=True)
+
+    async def _update(self, query: dict, update: dict, upsert: bool = False) -> int:
+        doc = self._first(query)
+        if doc is None:
+            if not upsert:
+                return 0
+            doc = self._insert({key: value for key, value in query.items() if not key.startswith('$')})
+        _apply_update(doc, update)
+        return 1
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await asyncio.sleep(0)
+        matched = await self._update(query, update, upsert)
+        return UpdateResult({'n': matched, 'nModified': matched}, acknowledged=True)
+
+    async def replace_one(self, query: dict, replacement: dict, upsert: bool = False):
+        await asyncio.sleep(0)
+        doc = self._first(query)
+        if doc is not None:
+            self.docs.remove(doc)
+            replacement = dict(replacement, _id=doc['_id'])
+        if doc is not None or upsert:
+            self._insert(replacement)
+        return UpdateResult({'n': int(doc is not None), 'nModified': int(doc is not None)}, acknowledged=True)
+
+    async def bulk_write(self, operations, ordered: bool = True):
+        await asyncio.sleep(0)
+        modified = deleted = 0
+        for operation in operations:
+            # pymongo's operation classes keep their arguments in private slots
+            if isinstance(operation, DeleteOne):
+                doc = self._first(operation._filter)
+                if doc is not None:
+                    self.docs.remove(doc)
+                    deleted += 1
+                continue
+            modified += await self._update(operation._filter, operation._doc, operation._upsert)
+        return BulkWriteResult({'nModified': modified, 'nUpserted': 0, 'nMatched': modified, 'nRemoved': deleted},
+                               acknowledged=True)
+
+    async def delete_one(self, query: dict):
+        await asyncio.sleep(0)
+        doc = self._first(query)
+        if doc is not None:
+            self.docs.remove(doc)
+        return DeleteResult({'n': int(doc is not None)}, acknowledged=True)
+
+    async def count_documents(self, query: dict):
+        await asyncio.sleep(0)
+        return sum(1 for doc in self.docs if _matches(doc, query))
+
+    async def create_index(self, *args, **kwargs):
+        await asyncio.sleep(0)
+        return 'fake_index'
+
+    def watch(self, *args, **kwargs):
+        # behave like a standalone mongod, so PrefixStore falls back to polling
+        raise OperationFailure('The $changeStream stage is only supported on replica sets',
+                               code=CHANGE_STREAM_UNSUPPORTED)
+
+
+class FakeDatabase:
+    def __init__(self, name: str = 'testpoddodb'):
+        self.name = name
+        self.collections = dict()
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self.collections:
+            self.collections[name] = FakeCollection(name)
+        return self.collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
+
+
+class FakeClient:
+    def __init__(self):
+        self.databases = dict()
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        if name not in self.databases:
+            self.databases[name] = FakeDatabase(name)
+        return self.databases[name]
+
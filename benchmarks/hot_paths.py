@@ -0,0 +1,250 @@
+"""
+Micro-benchmarks for the bot's hot paths, run against in-memory fakes so neither Discord nor Mongo is needed.
+
+Run from the repository root:
+
+    python -m benchmarks.hot_paths                   # run, save as the current VERSION, compare to the last run
+    python -m benchmarks.hot_paths --version 1.2.0   # save under a specific version
+    python -m benchmarks.hot_paths --compare 1.1.0   # compare to a specific saved version
+    python -m benchmarks.hot_paths --no-save
+
+Results are saved to benchmarks/results/<version>.json. A case that got more than --threshold slower than the
+run it is compared to is reported as a regression, and the exit code is 1.
+"""
+import argparse
+import asyncio
+import datetime
+import glob
+import json
+import os
+import platform
+import random
+import sys
+import time
+import timeit
+from types import SimpleNamespace
+
+from discord.ext import commands
+
+import config
+from benchmarks.embeds import make_context
+from benchmarks.fakes import FakeDatabase
+from bot import get_prefix, prefix_matcher
+from cogs.rpg.cache import CharacterCache
+from cogs.rpg.loot import LootTable
+from cogs.rpg.models.character import Character
+from utils.context import PoddoContext
+from utils.functions import create_default_embed
+from utils.prefixes import PrefixStore
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+NUMBER = 10000
+REPEAT = 5
+GUILDS = 5000
+CHARACTERS = 1000
+
+CHARACTER_DOC = {
+    'name': 'Poddo', 'owner_id': 1, 'level': 12, 'xp': 153, 'gold': 420,
+    'inventory': {'items': [
+        {'name': 'Old Fishing Rod', 'type': 'fishing_rod', 'stats': {'fishing': 1}},
+        {'name': 'Rusty Pickaxe', 'type': 'pickaxe', 'stats': {'mining': 1}},
+    ]},
+}
+
+
+async def setup() -> SimpleNamespace:
+    """Builds the fake database, caches and contexts every case runs against."""
+    db = FakeDatabase()
+    for guild_id in range(GUILDS):
+        db['prefixes'].docs.append({'_id': guild_id, 'guild_id': str(guild_id), 'prefix': '?'})
+    for owner_id in range(CHARACTERS):
+        db['rpg-characters-db'].docs.append(dict(CHARACTER_DOC, _id=owner_id, owner_id=owner_id))
+
+    prefixes = PrefixStore(db['prefixes'], default=config.PREFIX, max_size=GUILDS * 2)
+    await prefixes.load()
+    # a store that has to go to the database on every miss
+    cold_prefixes = PrefixStore(db['prefixes'], default=config.PREFIX, max_size=1)
+
+    embed_ctx = make_context()
+    bot = SimpleNamespace(
+        user=embed_ctx.bot.user, prefixes=prefixes, mdb=db,
+        characters=CharacterCache(db['rpg-characters-db'], max_size=CHARACTERS),
+    )
+    message = SimpleNamespace(guild=SimpleNamespace(id=GUILDS // 2), author=SimpleNamespace(id=0),
+                              content='?rpg fish', _state=None)
+    ctx = PoddoContext(message=message, bot=bot, prefix='?')
+    # the fakes scan their documents, so cold lookups use the first one to keep the scan out of the timing
+    cold_ctx = PoddoContext(message=message, bot=bot, prefix='?')
+    # alternating between the first few guilds, so the single entry cold prefix store always misses
+    guild_messages = [SimpleNamespace(guild=SimpleNamespace(id=guild_id), content='?rpg fish')
+                      for guild_id in range(16)]
+
+    fish = [{'name': f'Fish {i}', 'rarity': 1.5, 'tier': 1} for i in range(60)]
+
+    group = commands.Group(_noop, name='rpg', help='Shows your character.')
+    for name in ('setup', 'delete', 'leaderboard', 'fish'):
+        group.add_command(commands.Command(_noop, name=name, help=f'The {name} command.'))
+    command_list = [group, *group.commands, commands.Command(_noop, name='secret', hidden=True)]
+
+    return SimpleNamespace(
+        db=db, bot=bot, message=message, guild_messages=guild_messages, ctx=ctx, cold_ctx=cold_ctx,
+        embed_ctx=embed_ctx,
+        cold_prefixes=SimpleNamespace(user=bot.user, prefixes=cold_prefixes),
+        character=Character.from_dict(CHARACTER_DOC), table=LootTable(fish), command_list=command_list,
+    )
+
+
+async def _noop(ctx):
+    pass
+
+
+def cases(env: SimpleNamespace) -> dict:
+    """
+    Every benchmarked case.
+    :return: name -> zero argument callable. Callables that return a coroutine are awaited.
+    """
+    try:
+        from cogs.help import generate_command_names
+    except ImportError:
+        # cogs.help needs discord-ext-menus
+        generate_command_names = None
+
+    amounts = [random.randint(-500, 500) for _ in range(1024)]
+    amount_index = iter(range(sys.maxsize))
+
+    def mod_xp():
+        env.character.mod_xp(amounts[next(amount_index) & 1023])
+
+    guild_index = iter(range(sys.maxsize))
+
+    def get_prefix_miss():
+        return get_prefix(env.cold_prefixes, env.guild_messages[next(guild_index) & 15])
+
+    def get_character_cold():
+        env.bot.characters.clear()
+        return env.cold_ctx.get_character()
+
+    chat = 'just talking about fishing, not running a command'
+    guild_id = str(env.message.guild.id)
+
+    def reject_non_command():
+        # the check PoddoBot.on_message makes before building a context
+        prefix = env.bot.prefixes.get_cached(guild_id)
+        return chat.startswith(prefix_matcher(env.bot.user.id, prefix))
+
+    result = {
+        'reject_non_command': reject_non_command,
+        'get_prefix': lambda: get_prefix(env.bot, env.message),
+        'get_prefix_miss': get_prefix_miss,
+        'get_character': lambda: env.ctx.get_character(),
+        'get_character_cold': get_character_cold,
+        'character_from_dict': lambda: Character.from_dict(CHARACTER_DOC),
+        'mod_xp': mod_xp,
+        'loot_pick': lambda: env.table.pick(),
+        'create_default_embed': lambda: create_default_embed(env.embed_ctx),
+    }
+    if generate_command_names is not None:
+        result['generate_command_names'] = lambda: generate_command_names(env.command_list, short_doc=True)
+    return result
+
+
+async def _time_async(func, number: int) -> float:
+    start = time.perf_counter()
+    for _ in range(number):
+        await func()
+    return time.perf_counter() - start
+
+
+async def run(number: int = NUMBER, repeat: int = REPEAT) -> dict:
+    """
+    Times every case.
+    :return: case name -> best seconds per call
+    """
+    env = await setup()
+    results = {}
+    for name, func in cases(env).items():
+        if asyncio.iscoroutine(probe := func()):
+            await probe
+            best = min([await _time_async(func, number) for _ in range(repeat)])
+        else:
+            best = min(timeit.repeat(func, number=number, repeat=repeat))
+        results[name] = best / number
+    return results
+
+
+def save(version: str, results: dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f'{version}.json')
+    with open(path, 'w') as f:
+        json.dump({
+            'version': version,
+            'date': datetime.datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'results': results,
+        }, f, indent=2, sort_keys=True)
+    return path
+
+
+def load(version: str = None, exclude: str = None):
+    """
+    Loads saved results.
+    :param str version: The version to load, or None for the most recently saved one.
+    :param str exclude: A version to skip when picking the most recent one.
+    :return: The saved run, or None if there is none.
+    :rtype: dict or None
+    """
+    if version is not None:
+        path = os.path.join(RESULTS_DIR, f'{version}.json')
+        if not os.path.exists(path):
+            return None
+    else:
+        paths = [x for x in glob.glob(os.path.join(RESULTS_DIR, '*.json'))
+                 if os.path.basename(x) != f'{exclude}.json']
+        if not paths:
+            return None
+        path = max(paths, key=os.path.getmtime)
+    with open(path) as f:
+        return json.load(f)
+
+
+def report(results: dict, baseline: dict = None, threshold: float = 0.1) -> list:
+    """
+    Prints the results next to a baseline run.
+    :return: The names of the cases that regressed by more than `threshold`.
+    """
+    regressions = []
+    if baseline is not None:
+        print(f'Compared to {baseline["version"]} ({baseline["date"]}, Python {baseline["python"]})')
+    for name, seconds in results.items():
+        line = f'{name:<24} {seconds * 1e6:9.2f} us'
+        before = (baseline or {}).get('results', {}).get(name)
+        if before:
+            change = seconds / before - 1
+            line += f'   was {before * 1e6:9.2f} us  {change:+7.1%}'
+            if change > threshold:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks the bot\'s hot paths.')
+    parser.add_argument('--version', default=config.VERSION, help='Version to save the results under.')
+    parser.add_argument('--compare', help='Version to compare against, defaults to the last saved run.')
+    parser.add_argument('--number', type=int, default=NUMBER, help='Calls per timing.')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Slowdown that counts as a regression.')
+    parser.add_argument('--no-save', action='store_true', help='Do not save the results.')
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.number))
+    baseline = load(args.compare, exclude=None if args.compare else args.version)
+    regressions = report(results, baseline, args.threshold)
+    if not args.no_save:
+        print(f'Saved to {save(args.version, results)}')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
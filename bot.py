@@ -1,12 +1,27 @@
+import asyncio
 import datetime
+import functools
 import logging
+import os
+import time
 
+import discord
 import motor.motor_asyncio
 from discord.ext import commands
 
 import config
+from cogs.rpg.cache import CharacterCache
 from utils.context import PoddoContext
+from utils.cooldowns import CooldownStore
+from utils.deletion import DeletionQueue
+from utils.error_reporting import ErrorReporter
 from utils.functions import *
+from utils.health import HealthServer, LoopMonitor
+from utils.indexes import IndexRegistry
+from utils.ipc import IPCClient
+from utils.metrics import Metrics
+from utils.prefixes import PrefixStore
+from utils.prompts import PromptDispatcher
 
 
 log = logging.getLogger(__name__)
@@ -17,42 +32,295 @@ COGS = {
     'cogs.help'
 }
 
+# Extensions that can wait to be imported until one of their commands is used, and the cog they add. Each gets stub
+# commands until then, with the name, aliases and help of the real top level commands so help can list them.
+# Extensions with listeners, like the error handler, have to load eagerly.
+LAZY_COGS = {
+    'jishaku': ('Jishaku', [
+        {'name': 'jishaku', 'aliases': ['jsk'], 'help': 'The Jishaku debug and diagnostic commands.', 'hidden': True},
+    ]),
+    'cogs.admin': ('Admin', [
+        {'name': 'admin', 'help': 'Owner-only commands for the bot.', 'owner_only': True},
+    ]),
+    'cogs.rpg.cog': ('RPG', [
+        {'name': 'rpg', 'aliases': ['game', 'g'],
+         'help': 'Base command for all RPG commands. Shows status of Character'},
+        {'name': 'dev', 'help': 'Commands for the Developer.', 'hidden': True},
+    ]),
+}
+
+
+@functools.lru_cache(maxsize=256)
+def prefix_matcher(user_id: int, prefix: str) -> tuple:
+    """
+    Everything a command can start with for a prefix, in the order `when_mentioned_or` gives them.
+    Cached, as there are only ever a handful of distinct prefixes, and can be passed straight to `str.startswith`.
+    :param int user_id: The bot's user ID, for the mention forms.
+    :param str prefix: The guild's prefix.
+    :rtype: tuple[str]
+    """
+    return f'<@{user_id}> ', f'<@!{user_id}> ', prefix
+
 
 async def get_prefix(client, message):
     if not message.guild:
-        return commands.when_mentioned_or(config.PREFIX)(client, message)
-    guild_id = str(message.guild.id)
-    if guild_id in client.prefixes:
-        # if we already have a cached prefix, use that
-        prefix = client.prefixes.get(guild_id, config.PREFIX)
-    else:
-        # db search
-        result = await client.mdb['prefixes'].find_one({'guild_id': guild_id})
-        if result is not None:
-            prefix = result.get('prefix', config.PREFIX)
-        else:
-            prefix = config.PREFIX
-        # cache prefix
-        client.prefixes[guild_id] = prefix
-    return commands.when_mentioned_or(prefix)(client, message)
-
-
-class PoddoBot(commands.Bot):
-    def __init__(self, command_prefix=get_prefix, desc='', **options):
+        return list(prefix_matcher(client.user.id, config.PREFIX))
+    prefix = await client.prefixes.get(str(message.guild.id))
+    return list(prefix_matcher(client.user.id, prefix))
+
+
+class PoddoBot(commands.AutoShardedBot):
+    def __init__(self, command_prefix=get_prefix, desc='', cluster_id: int = None, ipc: IPCClient = None, **options):
         self.launch_time = datetime.datetime.utcnow()
 
+        # set when running as one cluster of several, see launcher.py
+        self.cluster_id = cluster_id
+        self.ipc = ipc
+
         self.ready_time = None
         self._dev_id = config.DEV_ID
         self.environment = config.ENVIRONMENT
 
-        self.mongo_client = motor.motor_asyncio.AsyncIOMotorClient(config.MONGO_URL)
+        # command and Mongo latency histograms, see `admin perf`
+        self.metrics = Metrics()
+        self.mongo_client = motor.motor_asyncio.AsyncIOMotorClient(config.MONGO_URL,
+                                                                    event_listeners=[self.metrics.mongo_listener])
         self.mdb = self.mongo_client[config.MONGO_DB]
 
         self.sentry_url = config.SENTRY_URL
-        self.prefixes = dict()
+        # extension name -> (seconds running the module, seconds running its setup)
+        self.startup_report = dict()
+        # bumped whenever a cog is added or removed, so anything cached per command set knows to rebuild
+        self.cog_generation = 0
+
+        self.indexes = IndexRegistry(self.mdb)
+        self.indexes.declare_index('prefixes', 'guild_id', unique=True)
+        self.indexes.declare_query('prefixes', {'guild_id': '0'})
+        # expired cooldowns are removed by Mongo
+        self.indexes.declare_index('cooldowns', 'expires_at', expireAfterSeconds=0)
+        self.indexes.declare_query('cooldowns', {'expires_at': {'$gt': datetime.datetime.utcnow()}})
+
+        self.prefixes = PrefixStore(self.mdb['prefixes'], default=config.PREFIX,
+                                    max_size=config.PREFIX_CACHE_SIZE, poll_interval=config.PREFIX_POLL_INTERVAL)
 
         super(PoddoBot, self).__init__(command_prefix, description=desc, **options)
 
+        self.errors = ErrorReporter(self.sentry_url, environment=self.environment, release=config.VERSION,
+                                    window=config.ERROR_WINDOW, rate_limit=config.ERROR_RATE_LIMIT)
+        self.errors.start(self.loop)
+        self.deletions = DeletionQueue(delay=config.DELETE_DELAY)
+        self.prompts = PromptDispatcher()
+        self.indexes.start(self.loop)
+        self.prefixes.start(self.loop)
+
+        # write-behind caches, flushed in the background and on shutdown
+        self.writers = []
+        # clusters write characters through almost right away, so the others can be told to drop their copy
+        self.characters = CharacterCache(self.mdb['rpg-characters-db'], max_size=config.CHARACTER_CACHE_SIZE,
+                                         interval=config.CHARACTER_FLUSH_INTERVAL,
+                                         max_pending=1 if self.ipc is not None else 100)
+        self.add_writer(self.characters)
+        self.cooldowns = CooldownStore(self.mdb['cooldowns'], interval=config.COOLDOWN_FLUSH_INTERVAL)
+        self.add_writer(self.cooldowns)
+
+        self.monitor = LoopMonitor(threshold=config.LOOP_LAG_THRESHOLD, latency=lambda: self.latency)
+        self.monitor.start(self.loop)
+        self.health = None
+        if config.HEALTH_PORT:
+            # clusters each get their own port, counting up from HEALTH_PORT
+            port = config.HEALTH_PORT + (self.cluster_id or 0)
+            self.health = HealthServer(self, self.monitor, host=config.HEALTH_HOST, port=port)
+            self.loop.create_task(self.health.start())
+
+        if config.METRICS_PATH:
+            path = config.METRICS_PATH
+            if self.cluster_id is not None:
+                root, ext = os.path.splitext(path)
+                path = f'{root}-{self.cluster_id}{ext}'
+            self.loop.create_task(self.metrics.write_every(path, config.METRICS_INTERVAL))
+
+        if self.ipc is not None:
+            self.ipc.handler('guild_count')(self._ipc_guild_count)
+            self.ipc.handler('reload')(self._ipc_reload)
+            self.ipc.handler('cooldown')(self._ipc_cooldown)
+            self.cooldowns.listeners.append(self._share_cooldown)
+            self.ipc.handler('characters')(self._ipc_characters)
+            self.characters.flush_listeners.append(self._share_characters)
+            self.characters.listeners.append(self._share_character_delete)
+            self.ipc.start(self.loop)
+
+    def add_writer(self, writer):
+        """Starts a BatchWriter and makes sure it gets flushed when the bot shuts down."""
+        writer.start(self.loop)
+        self.writers.append(writer)
+
+    async def remove_writer(self, writer):
+        """Stops a BatchWriter added with add_writer, flushing what it has left."""
+        if writer in self.writers:
+            self.writers.remove(writer)
+        await writer.close()
+
+    def load_extensions(self, extensions, lazy: bool = False):
+        """
+        Loads extensions, timing each one.
+        :param extensions: The names of the extensions to load.
+        :param bool lazy: Whether extensions in LAZY_COGS should only be loaded when one of their commands is used.
+        """
+        for name in extensions:
+            if lazy and name in LAZY_COGS:
+                self.add_lazy_extension(name)
+            else:
+                self.timed_load_extension(name)
+
+    def timed_load_extension(self, name: str):
+        """Loads an extension and logs how long it took, see `_load_from_module_spec` for the startup_report."""
+        self.load_extension(name)
+        imported, setup = self.startup_report[name]
+        log.info(f'Loaded {name} (import {imported * 1000:.1f} ms, setup {setup * 1000:.1f} ms)')
+
+    def _load_from_module_spec(self, spec, key):
+        # times running the module apart from its setup, without importing it a second time to do so
+        exec_module = spec.loader.exec_module
+        imported = 0.0
+
+        def timed_exec_module(module):
+            nonlocal imported
+            start = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                imported = time.perf_counter() - start
+
+        spec.loader.exec_module = timed_exec_module
+        start = time.perf_counter()
+        try:
+            super()._load_from_module_spec(spec, key)
+        finally:
+            del spec.loader.exec_module
+        self.startup_report[key] = (imported, time.perf_counter() - start - imported)
+
+    def add_lazy_extension(self, name: str):
+        """
+        Registers stub commands that load an extension the first time one is used, then run the real command.
+        :param str name: The name of the extension, a key of LAZY_COGS.
+        """
+        async def stub(ctx):
+            self.load_lazy_extension(name)
+            new_ctx = await self.get_context(ctx.message)
+            if new_ctx.command is not None and new_ctx.command is not ctx.command:
+                await self.invoke(new_ctx)
+
+        for info in LAZY_COGS[name][1]:
+            command = commands.Command(stub, name=info['name'], aliases=info.get('aliases', []), help=info['help'],
+                                       hidden=info.get('hidden', False), ignore_extra=True)
+            if info.get('owner_only'):
+                commands.is_owner()(command)
+            command.lazy_extension = name
+            self.add_command(command)
+
+    def _lazy_stubs(self, name: str) -> list:
+        stubs = [self.get_command(info['name']) for info in LAZY_COGS[name][1]]
+        return [x for x in stubs if getattr(x, 'lazy_extension', None) == name]
+
+    @property
+    def lazy_extensions(self) -> list:
+        """Lazy extensions that have not been loaded yet."""
+        return [name for name in LAZY_COGS if self._lazy_stubs(name)]
+
+    def lazy_extension_for(self, name: str):
+        """
+        Returns the lazy extension that has not been loaded yet and adds a command or cog, if there is one.
+        :param str name: A top level command name or alias, or a cog name.
+        :rtype: str or None
+        """
+        extension = getattr(self.all_commands.get(name), 'lazy_extension', None)
+        if extension is None:
+            extension = next((x for x in self.lazy_extensions if LAZY_COGS[x][0] == name), None)
+        return extension
+
+    def reload_extension(self, name):
+        # a lazy extension that has not been used yet has nothing to reload, so just load it
+        if name in LAZY_COGS and name not in self.extensions:
+            return self.load_lazy_extension(name)
+        return super().reload_extension(name)
+
+    def load_lazy_extension(self, name: str):
+        """Swaps an extension's stub commands out for the real extension, if that has not happened yet."""
+        if name in self.extensions:
+            return
+        for stub in self._lazy_stubs(name):
+            self.remove_command(stub.name)
+        self.timed_load_extension(name)
+
+    async def _ipc_guild_count(self):
+        return len(self.guilds)
+
+    async def _ipc_reload(self, extension: str):
+        try:
+            self.reload_extension(extension)
+        except commands.ExtensionError as e:
+            return f'{e.__class__.__name__}: {e}'
+        return 'Reloaded'
+
+    async def _ipc_cooldown(self, name: str, user_id: int, expiry: float):
+        # the cluster that triggered it already persists it
+        self.cooldowns.set_expiry(name, user_id, expiry)
+
+    def _share_cooldown(self, name: str, user_id: int, expiry: float):
+        if self.ipc.connected:
+            asyncio.ensure_future(self._safe_ipc_request('cooldown', name=name, user_id=user_id, expiry=expiry))
+
+    async def _ipc_characters(self, origin: int, changed: list, deleted: list, reset: bool):
+        if origin == self.cluster_id:
+            return
+        if reset:
+            await self.characters.refresh()
+            self.dispatch('remote_character_reset')
+            return
+        for owner_id, name, level, xp in changed:
+            self.characters.invalidate(owner_id)
+            self.dispatch('remote_character_change', owner_id, (name, level, xp))
+        for owner_id in deleted:
+            self.characters.invalidate(owner_id)
+            self.dispatch('remote_character_change', owner_id, None)
+
+    def _share_characters(self, chars: list):
+        self.broadcast_characters(changed=chars)
+
+    def _share_character_delete(self, owner_id: int, char):
+        if char is None:
+            self.broadcast_characters(deleted=[owner_id])
+
+    def broadcast_characters(self, changed: list = (), deleted: list = (), reset: bool = False):
+        """
+        Tells the other clusters which characters were written, so they drop their cached copies and update their
+        leaderboards. Does nothing if not clustered.
+        :param list changed: Characters that were written.
+        :param list deleted: Owner IDs of characters that were deleted.
+        :param bool reset: Whether every character changed, so the other clusters reload everything.
+        """
+        if self.ipc is None or not self.ipc.connected:
+            return
+        changed = [[char.owner_id, char.name, char.level, char.xp] for char in changed]
+        asyncio.ensure_future(self._safe_ipc_request('characters', origin=self.cluster_id, changed=changed,
+                                                     deleted=list(deleted), reset=reset))
+
+    async def _safe_ipc_request(self, command: str, **args):
+        try:
+            await self.ipc.request(command, **args)
+        except (ConnectionError, asyncio.TimeoutError):
+            log.warning(f'IPC request {command} failed.')
+
+    async def total_guild_count(self) -> int:
+        """The amount of guilds across every cluster, or just this one if not clustered."""
+        if self.ipc is None or not self.ipc.connected:
+            return len(self.guilds)
+        try:
+            counts = await self.ipc.request('guild_count')
+        except (ConnectionError, asyncio.TimeoutError):
+            return len(self.guilds)
+        return sum(counts.values())
+
     @property
     def dev_id(self):
         return self._dev_id
@@ -66,10 +334,14 @@ class PoddoBot(commands.Bot):
     async def on_ready(self):
         self.ready_time = datetime.datetime.utcnow()
 
+        cluster = f'Cluster {self.cluster_id} ' if self.cluster_id is not None else ''
+        startup = (self.ready_time - self.launch_time).total_seconds()
         ready_message = f'\n{"-" * 25}\n' \
                         f'Bot Ready!\n' \
                         f'Logged in as {self.user.name} (ID: {self.user.id})\n' \
                         f'Current Prefix: {config.PREFIX}\n' \
+                        f'{cluster}Shards: {self.shard_ids or "all"} of {self.shard_count}\n' \
+                        f'Ready {startup:.2f}s after launch\n' \
                         f'{"-" * 25}'
         log.info(ready_message)
 
@@ -77,27 +349,74 @@ class PoddoBot(commands.Bot):
         if message.author.bot:
             return None
 
+        self.prompts.dispatch(message)
+
         if not self.is_ready():
             return None
 
+        # most messages are not commands, so turn those away before building a context for them
+        prefix = self.prefixes.get_cached(str(message.guild.id)) if message.guild else config.PREFIX
+        if prefix is not None and not message.content.startswith(prefix_matcher(self.user.id, prefix)):
+            return None
+
         context = await self.get_context(message)
         if context.command is not None:
             return await self.invoke(context)
 
     async def on_command(self, ctx):
-        if ctx.command.name in ['py', 'pyi', 'sh']:
+        if config.MEMBER_CACHE == 'interacted' and ctx.guild is not None and isinstance(ctx.author, discord.Member):
+            if ctx.guild.get_member(ctx.author.id) is None:
+                # discord.py has no public way to cache a single member, and chunking would cache all of them
+                ctx.guild._add_member(ctx.author)
+
+        if ctx.command.name in ['py', 'pyi', 'sh'] or hasattr(ctx.command, 'lazy_extension'):
+            # lazy stubs invoke the real command, which gets here again
             return
 
-        await try_delete(ctx.message)
+        self.deletions.schedule(ctx.message)
 
     async def on_guild_join(self, joined):
         # Check to make sure we aren't approaching guild limit.
-        if len(self.guilds) > 90:
+        if config.GUILD_LIMIT and await self.total_guild_count() > config.GUILD_LIMIT:
             if joined.system_channel:
                 await joined.system_channel.send('Until I am verified, I cannot join any more servers. '
                                                  'Please contact my developer if you see this message.')
             await joined.leave()
 
     # ---- Overrides ----
+    def add_cog(self, cog):
+        super().add_cog(cog)
+        self.cog_generation += 1
+
+    def remove_cog(self, name):
+        super().remove_cog(name)
+        self.cog_generation += 1
+
+    async def close(self):
+        if self.ipc is not None:
+            self.ipc.stop()
+        if self.health is not None:
+            await self.health.close()
+        self.monitor.stop()
+        await self.deletions.flush()
+        await self.errors.close()
+        for writer in self.writers:
+            try:
+                await writer.close()
+            except Exception:
+                log.exception(f'Could not flush {writer.__class__.__name__} on shutdown.')
+        await super().close()
+
+    async def invoke(self, ctx):
+        if ctx.command is None or hasattr(ctx.command, 'lazy_extension'):
+            return await super().invoke(ctx)
+        start = time.perf_counter()
+        try:
+            await super().invoke(ctx)
+        finally:
+            # ctx.command is the subcommand that actually ran by now
+            self.metrics.record_command(ctx.command.qualified_name, time.perf_counter() - start,
+                                        failed=ctx.command_failed)
+
     async def get_context(self, message, *, cls=PoddoContext):
         return await super().get_context(message, cls=cls)
@@ -0,0 +1,11 @@
+"""
+Entry point for the cluster worker processes started by launcher.py.
+
+Worker processes are spawned, so the target has to be importable by name. It lives in this module, which imports
+nothing at the top level, so the launcher process never loads the bot or the logging setup in main.py.
+"""
+
+
+def run_cluster(cluster_id: int, shard_ids: list, shard_count: int, ipc_port: int, ipc_secret: str):
+    from main import run_cluster
+    run_cluster(cluster_id, shard_ids, shard_count, ipc_port, ipc_secret)
@@ -1,21 +1,37 @@
+import asyncio
+import copy
+import cProfile
 import io
 import logging
+import pstats
 import textwrap
+import time
 import traceback
+import tracemalloc
 from contextlib import redirect_stdout
 
 import discord
+import psutil
 from discord.ext import commands
 
+import config
 from utils.functions import yes_or_no, create_default_embed
 
 log = logging.getLogger(__name__)
 
+# How many functions and allocation sites `admin profile` lists, and how deep allocation tracebacks go
+PROFILE_ENTRIES = 30
+PROFILE_TRACEBACK_DEPTH = 10
+
 
 class Admin(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self._last_result = None
+        # kept around so cpu_percent measures since the last report
+        self.process = psutil.Process()
+        # only one profiler can be active at a time
+        self._profiling = asyncio.Lock()
 
     async def cog_check(self, ctx):
         return await self.bot.is_owner(ctx.author)
@@ -37,6 +53,197 @@ class Admin(commands.Cog):
             log.warning(f'Bot restart initiated by {ctx.author.name}')
             await self.bot.logout()
 
+    @admin.command(name='indexes')
+    async def indexes(self, ctx):
+        """
+        Explains every registered query shape and flags any that scan a whole collection.
+        """
+        results = await self.bot.indexes.audit()
+        embed = create_default_embed(ctx)
+        embed.title = 'Query Plan Audit'
+        lines = []
+        for collection, query, stages in results:
+            flag = '\N{WARNING SIGN} COLLSCAN' if 'COLLSCAN' in stages else '\N{WHITE HEAVY CHECK MARK}'
+            lines.append(f'{flag} `{collection}` `{query}`\n-> {" > ".join(stages)}')
+        embed.description = '\n'.join(lines) or 'No query shapes registered.'
+        embed.colour = discord.Colour.red() if any('COLLSCAN' in x[2] for x in results) else discord.Colour.green()
+        return await ctx.send(embed=embed)
+
+    @admin.command(name='prompts')
+    async def prompts(self, ctx):
+        """
+        Shows how many prompts are waiting for an answer.
+        """
+        open_prompts = self.bot.prompts.open_prompts()
+        embed = create_default_embed(ctx)
+        embed.title = 'Open Prompts'
+        embed.description = f'{len(self.bot.prompts)} prompts open across {len(open_prompts)} channel/user pairs.'
+        lines = [f'<#{channel_id}> <@{author_id}>: {count}'
+                 for (channel_id, author_id), count in list(open_prompts.items())[:20]]
+        if lines:
+            embed.add_field(name='Waiting', value='\n'.join(lines))
+        return await ctx.send(embed=embed)
+
+    @admin.command(name='clusters')
+    async def clusters(self, ctx):
+        """
+        Shows the guild count of every cluster.
+        """
+        embed = create_default_embed(ctx)
+        embed.title = 'Clusters'
+        if self.bot.ipc is None or not self.bot.ipc.connected:
+            embed.description = f'Not clustered. Shards: {self.bot.shard_count}, Guilds: {len(self.bot.guilds)}'
+            return await ctx.send(embed=embed)
+
+        counts = await self.bot.ipc.request('guild_count')
+        for cluster_id, count in sorted(counts.items()):
+            embed.add_field(name=f'Cluster {cluster_id}', value=f'{count} guilds')
+        embed.description = f'{sum(counts.values())} guilds across {len(counts)} clusters.'
+        return await ctx.send(embed=embed)
+
+    @admin.command(name='reload')
+    async def reload(self, ctx, extension: str):
+        """
+        Reloads an extension, on every cluster if clustered.
+        """
+        embed = create_default_embed(ctx)
+        embed.title = f'Reloading `{extension}`'
+        if self.bot.ipc is None or not self.bot.ipc.connected:
+            try:
+                self.bot.reload_extension(extension)
+            except commands.ExtensionError as e:
+                embed.description = f'{e.__class__.__name__}: {e}'
+            else:
+                embed.description = 'Reloaded'
+            return await ctx.send(embed=embed)
+
+        results = await self.bot.ipc.request('reload', extension=extension)
+        embed.description = '\n'.join(f'Cluster {cluster_id}: {result}' for cluster_id, result in sorted(results.items()))
+        return await ctx.send(embed=embed)
+
+    @admin.command(name='memory', aliases=['mem'])
+    async def memory(self, ctx):
+        """
+        Shows the process memory use and the size of the bot's caches.
+        """
+        process = self.process
+        with process.oneshot():
+            memory = process.memory_info()
+            cpu = process.cpu_percent()
+
+        embed = create_default_embed(ctx)
+        embed.title = 'Memory Report'
+        embed.description = f'Member cache policy: `{config.MEMBER_CACHE}` ' \
+                            f'(chunking {"on" if config.CHUNK_GUILDS else "off"})'
+        embed.add_field(name='Process', value=f'RSS: {memory.rss / 1024 ** 2:.1f} MiB\n'
+                                              f'VMS: {memory.vms / 1024 ** 2:.1f} MiB\n'
+                                              f'CPU: {cpu:.1f}%')
+        embed.add_field(name='Discord', value=f'Guilds: {len(self.bot.guilds)}\n'
+                                              f'Members: {sum(len(g.members) for g in self.bot.guilds)}\n'
+                                              f'Users: {len(self.bot.users)}\n'
+                                              f'Messages: {len(self.bot.cached_messages)}')
+        rpg = self.bot.get_cog('RPG')
+        embed.add_field(name='Poddo', value=f'Prefixes: {len(self.bot.prefixes)}\n'
+                                            f'Characters: {len(self.bot.characters)} '
+                                            f'({self.bot.characters.pending} dirty)\n'
+                                            f'Leaderboard: {len(rpg.leaderboard) if rpg else "N/A"}\n'
+                                            f'Open Prompts: {len(self.bot.prompts)}\n'
+                                            f'Pending Deletes: {self.bot.deletions.pending}')
+        return await ctx.send(embed=embed)
+
+    @admin.command(name='perf')
+    async def perf(self, ctx, amount: int = 10):
+        """
+        Shows the slowest commands and Mongo operations, by 95th percentile latency.
+        """
+        command_stats, mongo = self.bot.metrics.snapshot()
+
+        def lines(stats, name):
+            ordered = sorted(stats.items(), key=lambda x: x[1][2], reverse=True)[:amount]
+            return '\n'.join(f'`{name(key)}` n={count} p50={p50 * 1000:.0f}ms p95={p95 * 1000:.0f}ms'
+                             f'{f" errors={errors}" if errors else ""}'
+                             for key, (count, p50, p95, errors) in ordered) or 'Nothing recorded yet.'
+
+        embed = create_default_embed(ctx)
+        embed.title = 'Performance'
+        embed.add_field(name='Commands', value=lines(command_stats, str)[:1024], inline=False)
+        embed.add_field(name='Mongo', value=lines(mongo, lambda x: f'{x[0]}.{x[1]}')[:1024], inline=False)
+        if config.METRICS_PATH:
+            embed.set_footer(text=f'Prometheus metrics are written to {config.METRICS_PATH}')
+        return await ctx.send(embed=embed)
+
+    @admin.command(name='profile')
+    async def profile(self, ctx, *, command_line: str):
+        """
+        Runs a command under cProfile and tracemalloc, and attaches a report of where the time, memory and Mongo
+        calls went.
+        """
+        message = copy.copy(ctx.message)
+        message.content = ctx.prefix + command_line
+        new_ctx = await self.bot.get_context(message)
+        if new_ctx.command is None:
+            return await ctx.send(f'`{command_line}` is not a command.')
+        if self._profiling.locked():
+            return await ctx.send('Another command is being profiled.')
+
+        async with self._profiling:
+            profiler = cProfile.Profile()
+            was_tracing = tracemalloc.is_tracing()
+            if not was_tracing:
+                tracemalloc.start(PROFILE_TRACEBACK_DEPTH)
+            before = tracemalloc.take_snapshot()
+            with self.bot.metrics.capture() as mongo_calls:
+                start = time.perf_counter()
+                profiler.enable()
+                try:
+                    await self.bot.invoke(new_ctx)
+                finally:
+                    profiler.disable()
+                    elapsed = time.perf_counter() - start
+            after = tracemalloc.take_snapshot()
+            if not was_tracing:
+                tracemalloc.stop()
+
+        report = io.StringIO()
+        report.write(f'Profile of {message.content!r}\n'
+                     f'Wall time: {elapsed * 1000:.1f} ms, failed: {new_ctx.command_failed}\n'
+                     f'Everything else running on the event loop meanwhile is included too.\n\n')
+
+        report.write(f'=== Top {PROFILE_ENTRIES} functions by cumulative time ===\n')
+        pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(PROFILE_ENTRIES)
+
+        report.write(f'=== Top {PROFILE_ENTRIES} allocation sites ===\n')
+        for stat in after.compare_to(before, 'lineno')[:PROFILE_ENTRIES]:
+            report.write(f'{stat}\n')
+
+        total = sum(x[2] for x in mongo_calls)
+        report.write(f'\n=== Mongo calls: {len(mongo_calls)}, {total * 1000:.1f} ms total ===\n')
+        for collection, command, seconds, failed in mongo_calls:
+            report.write(f'{seconds * 1000:8.2f} ms  {collection}.{command}{"  FAILED" if failed else ""}\n')
+
+        file = discord.File(io.BytesIO(report.getvalue().encode()), filename='profile.txt')
+        return await ctx.send(f'Profiled `{command_line}`: {elapsed * 1000:.1f} ms, {len(mongo_calls)} Mongo calls.',
+                              file=file)
+
+    @admin.command(name='startup')
+    async def startup(self, ctx):
+        """
+        Shows how long each extension took to import and set up, slowest first.
+        """
+        report = self.bot.startup_report
+        embed = create_default_embed(ctx)
+        embed.title = 'Startup Report'
+        lines = [f'`{name}`: import {imported * 1000:.1f} ms, setup {setup * 1000:.1f} ms'
+                 for name, (imported, setup) in sorted(report.items(), key=lambda x: sum(x[1]), reverse=True)]
+        total = sum(sum(x) for x in report.values())
+        embed.description = '\n'.join(lines) + f'\n\nTotal: {total * 1000:.1f} ms'
+        if self.bot.ready_time is not None:
+            embed.description += f', ready {(self.bot.ready_time - self.bot.launch_time).total_seconds():.2f}s ' \
+                                 f'after launch'
+        if self.bot.lazy_extensions:
+            embed.add_field(name='Not Loaded Yet', value='\n'.join(f'`{x}`' for x in self.bot.lazy_extensions))
+        return await ctx.send(embed=embed)
+
     # Eval Code
     def cleanup_code(self, content):
         """Automatically removes code blocks from the code."""
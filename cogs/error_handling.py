@@ -1,14 +1,28 @@
 import discord
-import traceback
-import sys
 from discord.ext import commands
-import sentry_sdk
 import logging
 import pendulum
-from utils.functions import create_default_embed
+from utils.embeds import EmbedTemplate
 
 log = logging.getLogger(__name__)
 
+ERROR_COLOUR = discord.Colour.red()
+
+# Prebuilt error embeds, {placeholders} are filled in when rendered
+ERROR_TEMPLATES = {
+    'disabled': EmbedTemplate('Command Disabled!', '{command} has been disabled.', ERROR_COLOUR),
+    'roles': EmbedTemplate('Missing Roles!', 'Error: You must have any of the following roles to run this command: '
+                                             '{roles}', ERROR_COLOUR),
+    'permission': EmbedTemplate('Permission Error!', 'Error: {error}', ERROR_COLOUR),
+    'missing_argument': EmbedTemplate('Missing Argument!', 'Error: {error}', ERROR_COLOUR),
+    'bad_argument': EmbedTemplate('Invalid Argument!', 'Error: {error}', ERROR_COLOUR),
+    'parsing': EmbedTemplate('Invalid Argument(s)!', 'Error: {error}', ERROR_COLOUR),
+    'cooldown': EmbedTemplate('Command on Cooldown!', '`{command}` is on cooldown for {cooldown}', ERROR_COLOUR),
+    'forbidden': EmbedTemplate('Forbidden!', 'Error: {error}', ERROR_COLOUR),
+    'unknown': EmbedTemplate('Unknown Error!', 'An unknown error has occurred! A notification has been sent to the '
+                                               'bot developer.', ERROR_COLOUR),
+}
+
 
 class CommandErrorHandler(commands.Cog):
 
@@ -16,22 +30,8 @@ class CommandErrorHandler(commands.Cog):
         self.bot = bot
 
     def log_error(self, error=None, context=None):
-        # https://github.com/avrae/avrae/blob/master/dbot.py#L114
-        if self.bot.sentry_url is None and self.bot.environment != 'testing':
-            log.warning('SENTRY Error Handling is not setup.')
-            return
-
-        with sentry_sdk.push_scope() as scope:
-            scope.user = {"id": context.author.id, "username": str(context.author)}
-            scope.set_tag("message.content", context.message.content)
-            scope.set_tag("is_private_message", context.guild is None)
-            scope.set_tag("channel.id", context.channel.id)
-            scope.set_tag("channel.name", str(context.channel))
-            if context.guild_id is not None:
-                scope.set_tag("guild.id", context.guild_id)
-                scope.set_tag("guild.name", str(context.guild))
-            sentry_sdk.capture_exception(error)
-            log.info('Error logged to SENTRY')
+        # queued for the bot's ErrorReporter, which logs the traceback and sends it to Sentry off the event loop
+        self.bot.errors.report(error, context)
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx, error):
@@ -64,56 +64,38 @@ class CommandErrorHandler(commands.Cog):
         if isinstance(error, ignored):
             return
 
-        # Set up the Error Embed
-        embed = create_default_embed(ctx, colour=discord.Colour.red())
-
         if isinstance(error, commands.DisabledCommand):
-            embed.title = 'Command Disabled!'
-            embed.description = f'{ctx.command.qualified_name} has been disabled.'
-            await ctx.send(embed=embed)
+            await ctx.send(embed=ERROR_TEMPLATES['disabled'].render(ctx, command=ctx.command.qualified_name))
 
         elif isinstance(error, commands.MissingAnyRole):
             roles = ', '.join(error.missing_roles)
-            embed.title = 'Missing Roles!'
-            embed.description = f'Error: You must have any of the following roles to run this command: {roles}'
-            return await ctx.send(embed)
+            return await ctx.send(embed=ERROR_TEMPLATES['roles'].render(ctx, roles=roles))
 
         elif isinstance(error, commands.EmojiNotFound):
             return await ctx.send('I could not find the emoji that you provided. Either I do not have access to it, '
                                   'or it is a default emoji.')
 
         elif isinstance(error, commands.CheckFailure):
-            embed.title = 'Permission Error!'
             msg = str(error) or 'You are not allowed to run this command.'
-            embed.description = f'Error: {msg}'
-            return await ctx.send(embed=embed)
+            return await ctx.send(embed=ERROR_TEMPLATES['permission'].render(ctx, error=msg))
 
         elif isinstance(error, commands.MissingRequiredArgument):
-            embed.title = 'Missing Argument!'
-            embed.description = 'Error: ' + str(error) or "An error has occurred. Please contact the developer."
-            return await ctx.send(embed=embed)
+            return await ctx.send(embed=ERROR_TEMPLATES['missing_argument'].render(ctx, error=error))
 
         elif isinstance(error, commands.BadArgument) or isinstance(error, commands.BadUnionArgument):
-            embed.title = 'Invalid Argument!'
-            embed.description = 'Error: ' + str(error) or "Unknown Bad Argument"
-            return await ctx.send(embed=embed)
+            return await ctx.send(embed=ERROR_TEMPLATES['bad_argument'].render(ctx, error=error))
 
         elif isinstance(error, commands.ArgumentParsingError) or isinstance(error, commands.TooManyArguments):
-            embed.title = 'Invalid Argument(s)!'
-            embed.description = 'Error: ' + str(error) or "Unknown Argument Parsing Error"
-            return await ctx.send(embed=embed)
+            return await ctx.send(embed=ERROR_TEMPLATES['parsing'].render(ctx, error=error))
 
         elif isinstance(error, commands.CommandOnCooldown):
-            embed.title = 'Command on Cooldown!'
             cooldown = pendulum.duration(seconds=int(error.retry_after))
-            embed.description = f'`{ctx.prefix}{ctx.command.qualified_name}`' \
-                                f' is on cooldown for {cooldown.in_words()}'
-            return await ctx.send(embed=embed)
+            return await ctx.send(embed=ERROR_TEMPLATES['cooldown'].render(
+                ctx, command=f'{ctx.prefix}{ctx.command.qualified_name}', cooldown=cooldown.in_words()
+            ))
 
         elif isinstance(error, discord.Forbidden):
-            embed.title = 'Forbidden!'
-            embed.description = 'Error: ' + str(error) or "Not allowed to perform this action."
-            return await ctx.send(embed=embed)
+            return await ctx.send(embed=ERROR_TEMPLATES['forbidden'].render(ctx, error=error))
 
         elif isinstance(error, commands.NoPrivateMessage):
             try:
@@ -122,13 +104,11 @@ class CommandErrorHandler(commands.Cog):
                 pass
 
         else:
-            # All other Errors not returned come here. And we can just print the default TraceBack.
+            # All other Errors not returned come here, and are reported in the background.
             self.log_error(error, context=ctx)
-            embed.title = 'Unknown Error!'
-            embed.description = 'An unknown error has occurred! A notification has been sent to the bot developer.'
+            embed = ERROR_TEMPLATES['unknown'].render(ctx)
             embed.add_field(name='Error Type', value=f'{type(error)}')
-            log.error('Ignoring exception in command {}:'.format(ctx.command))
-            traceback.print_exception(type(error), error, error.__traceback__, file=sys.stderr)
+            await ctx.send(embed=embed)
 
 
 def setup(bot):
@@ -36,11 +36,9 @@ class HelpBotMenu(menus.ListPageSource):
         embed = create_default_embed(self.context)
         embed.title = self.embed_title
         embed.description = self.embed_desc
-        # Entries = List[tuple(Cog, Commands)]
+        # Entries = List[tuple(Cog Name, Command List)]
         for _, item in enumerate(entries, start=offset):
-            command_list = generate_command_names(item[1], short_doc=True)
-            output = '\n'.join(command_list)
-            embed.add_field(name=item[0].qualified_name, value=output, inline=False)
+            embed.add_field(name=item[0], value=item[1], inline=False)
         embed.set_footer(text=f'Page {menu.current_page+1}/{self.get_max_pages()}\n'+self.embed_footer)
         return embed
 
@@ -59,19 +57,58 @@ def generate_command_names(command_list, short_doc=False):
     return out
 
 
+async def permission_profile(ctx) -> str:
+    """
+    Buckets the invoker into the permission levels our command checks care about, so help output can be cached.
+    :return: One of `owner`, `dm`, `manage_guild` or `user`.
+    """
+    if await ctx.bot.is_owner(ctx.author):
+        return 'owner'
+    if ctx.guild is None:
+        return 'dm'
+    if ctx.author.guild_permissions.manage_guild:
+        return 'manage_guild'
+    return 'user'
+
+
 class CustomHelp(commands.HelpCommand):
+    async def prepare_help_command(self, ctx, command=None):
+        # the stubs of deferred extensions carry enough to list them, but not their sub-commands, so an extension
+        # is loaded when help is asked about one of its commands or its cog
+        if command is not None:
+            extension = ctx.bot.lazy_extension_for(command.split()[0])
+            if extension is not None:
+                ctx.bot.load_lazy_extension(extension)
+        await super().prepare_help_command(ctx, command)
+
+    async def cached(self, kind: str, name: str, build):
+        """
+        Returns help entries from the Help cog's cache, building them with `build` on a miss.
+        :param str kind: What the entries are for (`bot`, `cog`, `group`).
+        :param str name: The name of the cog or group.
+        :param build: Coroutine function that builds the entries.
+        """
+        key = (kind, name, await permission_profile(self.context))
+        return await self.cog.get_cached(key, build)
+
     async def send_bot_help(self, mapping):
         to_send = self.get_destination()
         title = 'PoddoBot Help'
         description = self.cog.bot.description
         footer = f'An underlined command has sub-commands.\n' \
                  f'See {self.clean_prefix}help <command name> for more details on individual commands.'
-        filtered_mapping = []
-        for cog in mapping:
-            command_list = await self.filter_commands(mapping[cog], sort=True)
-            if len(command_list) <= 0:
-                continue
-            filtered_mapping.append((cog, command_list))
+
+        async def build():
+            out = []
+            for cog in mapping:
+                command_list = await self.filter_commands(mapping[cog], sort=True)
+                if len(command_list) <= 0:
+                    continue
+                output = '\n'.join(generate_command_names(command_list, short_doc=True))
+                out.append((getattr(cog, 'qualified_name', 'No Category'), output))
+            return out
+
+        filtered_mapping = await self.cached('bot', '', build)
 
         source = HelpBotMenu(data=filtered_mapping, ctx=self.context, embed_title=title, embed_footer=footer,
                              embed_desc=description or 'No description specified.')
@@ -84,9 +121,13 @@ class CustomHelp(commands.HelpCommand):
         title = f'PoddoBot Help - `{cog.qualified_name}`'.strip()
         footer = f'An underlined command has sub-commands.\n' \
                  f'See {self.clean_prefix}help <command name> for more details on individual commands.'
-        command_list = await self.filter_commands(cog.get_commands(), sort=True)
+
+        async def build():
+            command_list = await self.filter_commands(cog.get_commands(), sort=True)
+            return generate_command_names(command_list)
+
         embed.description = cog.description or 'No description specified.'
-        out = generate_command_names(command_list)
+        out = await self.cached('cog', cog.qualified_name, build)
 
         source = HelpCogMenu(data=out, ctx=self.context, embed_title=title, embed_footer=footer,
                              embed_desc=cog.description or 'No description specified.')
@@ -98,8 +139,12 @@ class CustomHelp(commands.HelpCommand):
         title = f'PoddoBot Help - `{self.get_command_signature(group)}`'.strip()
         footer = f'An underlined command has sub-commands.\n' \
                  f'See {self.clean_prefix}help <command name> for more details on individual commands.'
-        command_list = await self.filter_commands(group.commands, sort=True)
-        out = generate_command_names(command_list, short_doc=True)
+
+        async def build():
+            command_list = await self.filter_commands(group.commands, sort=True)
+            return generate_command_names(command_list, short_doc=True)
+
+        out = await self.cached('group', group.qualified_name, build)
 
         source = HelpCogMenu(data=out, ctx=self.context, embed_title=title, embed_footer=footer,
                              embed_desc=group.help or 'No description specified.')
@@ -124,6 +169,19 @@ class Help(commands.Cog, name='Help'):
         bot.help_command = CustomHelp()
         bot.help_command.cog = self
 
+        # (kind, name, permission profile) -> help entries, valid for one cog generation of the bot
+        self._cache = dict()
+        self._cache_generation = bot.cog_generation
+
+    async def get_cached(self, key: tuple, build):
+        if self._cache_generation != self.bot.cog_generation:
+            # a cog was loaded or unloaded, so any of the entries could be out of date
+            self._cache.clear()
+            self._cache_generation = self.bot.cog_generation
+        if key not in self._cache:
+            self._cache[key] = await build()
+        return self._cache[key]
+
     def cog_unload(self):
         self.bot.help_command = self._original_help_command
 
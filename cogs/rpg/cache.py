@@ -0,0 +1,266 @@
+import asyncio
+import contextlib
+import logging
+import typing
+from collections import OrderedDict
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from cogs.rpg.models.character import Character
+from utils.writers import BatchWriter
+
+log = logging.getLogger(__name__)
+
+# write error codes that fail the same way however often the write is retried
+PERMANENT_WRITE_ERRORS = {
+    2,  # BadValue
+    9,  # FailedToParse
+    14,  # TypeMismatch
+    52,  # DollarPrefixedFieldName
+    66,  # ImmutableField
+    121,  # DocumentValidationFailure
+    11000,  # DuplicateKey
+}
+
+
+class CharacterCache(BatchWriter):
+    def __init__(self, collection, max_size: int = 5000, interval: float = 30, max_pending: int = 100):
+        """
+        Write-behind cache of Characters, keyed by owner ID.
+
+        Reads are served from memory after the first load. Committed characters are marked dirty and written
+        in one `bulk_write` every `interval` seconds, or once `max_pending` characters are dirty.
+
+        :param collection: MotorIO async Mongo DB collection holding the characters.
+        :param int max_size: The maximum amount of clean characters to keep in memory.
+        :param float interval: Seconds between flushes.
+        :param int max_pending: The amount of dirty characters that triggers an early flush.
+        """
+        super().__init__(interval=interval, max_pending=max_pending)
+        self.collection = collection
+        self.max_size = max_size
+
+        # owner_id -> Character, in least to most recently used order
+        self._characters = OrderedDict()
+        self._dirty = set()
+        # owners being written by the flush in progress, which are kept in memory like dirty ones
+        self._flushing = set()
+        # owner_id -> the state a flush that failed midway tried to write, it may or may not have been applied
+        self._unconfirmed = dict()
+        # owner_id -> Future, so concurrent misses for the same owner share one find_one
+        self._loading = dict()
+        # held while flushing or deleting, so a flush can never resurrect a deleted character
+        self._lock = asyncio.Lock()
+        # called with (owner_id, Character) on every commit, and (owner_id, None) on delete
+        self.listeners = []
+        # called with the list of Characters written by each flush
+        self.flush_listeners = []
+
+    def __len__(self):
+        return len(self._characters)
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def _store(self, char: Character):
+        self._characters[char.owner_id] = char
+        self._characters.move_to_end(char.owner_id)
+
+        if len(self._characters) <= self.max_size:
+            return
+        # only clean characters can be evicted, dirty ones stay until they are flushed
+        for owner_id in list(self._characters):
+            if len(self._characters) <= self.max_size:
+                break
+            if owner_id != char.owner_id and owner_id not in self._dirty and owner_id not in self._flushing:
+                del self._characters[owner_id]
+
+    async def get(self, owner_id: int) -> typing.Optional[Character]:
+        """
+        Returns the Character owned by someone, loading it from the database if it is not cached.
+        :param int owner_id: The ID of the owner.
+        :return: The Character, or None if they do not have one.
+        :rtype: Character or None
+        """
+        char = self._characters.get(owner_id)
+        if char is not None:
+            self._characters.move_to_end(owner_id)
+            return char
+
+        if owner_id not in self._loading:
+            self._loading[owner_id] = asyncio.ensure_future(self._load(owner_id))
+        return await asyncio.shield(self._loading[owner_id])
+
+    async def _load(self, owner_id: int) -> typing.Optional[Character]:
+        try:
+            data = await self.collection.find_one({'owner_id': owner_id})
+        finally:
+            del self._loading[owner_id]
+        if data is None:
+            return None
+
+        char = Character.from_dict(data)
+        self._store(char)
+        return char
+
+    def commit(self, char: Character):
+        """
+        Marks a Character as changed. It will be written to the database on the next flush.
+        :param Character char: The character to save.
+        """
+        # dirty first, so storing it can not evict it
+        self._dirty.add(char.owner_id)
+        self._store(char)
+        self._notify(char.owner_id, char)
+        self.check_pending()
+
+    def _notify(self, owner_id: int, char: typing.Optional[Character]):
+        for listener in self.listeners:
+            try:
+                listener(owner_id, char)
+            except Exception:
+                log.exception(f'Character listener {listener!r} failed.')
+
+    def invalidate(self, owner_id: int):
+        """
+        Forgets someone's Character if it is clean, so it is reloaded from the database on next use. Used when
+        another process has written it.
+        :param int owner_id: The ID of the owner.
+        """
+        if owner_id in self._dirty:
+            log.warning(f'Character {owner_id} was changed elsewhere while it has unwritten changes here.')
+            return
+        self._characters.pop(owner_id, None)
+
+    def clear(self):
+        """Forgets every clean Character, so they are reloaded from the database. Dirty ones are kept."""
+        for owner_id in list(self._characters):
+            if owner_id not in self._dirty:
+                del self._characters[owner_id]
+
+    @contextlib.asynccontextmanager
+    async def paused(self):
+        """
+        Holds off flushes and deletes while the collection is changed directly, then refreshes the cache.
+        Characters committed meanwhile stay dirty and are rebased when the block exits, so their next flush does
+        not overwrite the direct changes.
+        """
+        async with self._lock:
+            yield
+            await self._refresh()
+
+    async def refresh(self):
+        """Reloads every Character after the collection was changed directly, see `paused`."""
+        async with self._lock:
+            await self._refresh()
+
+    async def _refresh(self):
+        for owner_id in list(self._dirty):
+            char = self._characters.get(owner_id)
+            if char is None or char.is_new:
+                continue
+            doc = await self.collection.find_one({'owner_id': owner_id})
+            if doc is not None:
+                char.rebase(doc)
+        self.clear()
+
+    async def delete(self, owner_id: int):
+        """
+        Removes someone's Character from the cache and the database.
+        :param int owner_id: The ID of the owner.
+        :return: Delete result
+        """
+        async with self._lock:
+            self._characters.pop(owner_id, None)
+            self._dirty.discard(owner_id)
+            self._unconfirmed.pop(owner_id, None)
+            result = await self.collection.delete_one({'owner_id': owner_id})
+        self._notify(owner_id, None)
+        return result
+
+    async def flush(self):
+        """Writes every dirty Character in one bulk write."""
+        async with self._lock:
+            await self._confirm()
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+
+            operations = []
+            written = []
+            for owner_id in dirty:
+                char = self._characters.get(owner_id)
+                if char is None:
+                    continue
+                update = char.update_document()
+                if update is None:
+                    continue
+                operations.append(UpdateOne(char.sync_filter(), update, upsert=char.is_new))
+                written.append((char, char.sync_state()))
+            if not operations:
+                return
+
+            self._flushing = {char.owner_id for char, _ in written}
+            try:
+                await self.collection.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                # the operations that did go through are synced, so their $inc deltas are not sent twice
+                errors = {error['index']: error for error in e.details.get('writeErrors', [])}
+                flushed = []
+                for index, (char, state) in enumerate(written):
+                    error = errors.get(index)
+                    if error is None:
+                        char.mark_synced(state)
+                        flushed.append(char)
+                    elif error.get('code') in PERMANENT_WRITE_ERRORS:
+                        # drop the changes, the next read gets whatever the database has
+                        log.error(f'Could not write character {char.owner_id}, dropping its changes: '
+                                  f'{error.get("errmsg")}')
+                        self._characters.pop(char.owner_id, None)
+                        self._dirty.discard(char.owner_id)
+                    else:
+                        self._dirty.add(char.owner_id)
+                self._notify_flushed(flushed)
+                raise
+            except Exception:
+                # any of the writes may have been applied, which the next flush checks before resending them
+                for char, state in written:
+                    self._unconfirmed[char.owner_id] = state
+                self._dirty |= dirty
+                raise
+            finally:
+                self._flushing = set()
+
+            for char, state in written:
+                char.mark_synced(state)
+            log.debug(f'Flushed {len(operations)} characters.')
+        self._notify_flushed([char for char, _ in written])
+
+    async def _confirm(self):
+        """
+        Works out whether the writes of a flush that failed midway were applied, and rebases the characters onto
+        their documents so resending them can not apply the same $inc twice.
+        """
+        for owner_id, state in list(self._unconfirmed.items()):
+            char = self._characters.get(owner_id)
+            doc = None if char is None else await self.collection.find_one({'owner_id': owner_id})
+            del self._unconfirmed[owner_id]
+            if doc is None:
+                # deleted since, or a new character whose insert never happened
+                continue
+            # a write from another cluster in between makes an applied write look like it was not
+            if doc.get('name') == state['name'] and all(round(doc.get(key, 0), 3) == round(state[key], 3)
+                                                        for key in ('level', 'xp', 'gold')):
+                char.mark_synced(state)
+            char.rebase(doc)
+
+    def _notify_flushed(self, chars: typing.List[Character]):
+        if not chars:
+            return
+        for listener in self.flush_listeners:
+            try:
+                listener(chars)
+            except Exception:
+                log.exception(f'Character flush listener {listener!r} failed.')
@@ -1,29 +1,60 @@
-from discord.ext import commands
-from discord.ext.commands.cooldowns import BucketType
+from discord.ext import commands, menus
+from utils.cooldowns import shared_cooldown
+from utils.counters import CounterBuffer
+from utils.embeds import EmbedTemplate
 from utils.functions import create_default_embed, yes_or_no
 import discord
 from cogs.rpg.models.character import Character
-import random
+from cogs.rpg.loot import FishCatalog
+from cogs.rpg.leaderboard import Leaderboard
+from cogs.rpg.models.bulk import bulk_mod_xp
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+import asyncio
+import logging
 import typing
+import config
+
+log = logging.getLogger(__name__)
+
+
+NO_CHARACTER_TEMPLATE = EmbedTemplate(
+    title='You must have a character to run this command!',
+    description='Create a character with `{prefix}rpg setup`',
+    colour=discord.Colour.red()
+)
 
 
 def no_character_embed(ctx, title=None, desc=None):
-    embed = create_default_embed(ctx, colour=discord.Colour.red())
-    embed.title = title or 'You must have a character to run this command!'
-    embed.description = desc or f'Create a character with `{ctx.prefix}rpg setup`'
+    embed = NO_CHARACTER_TEMPLATE.render(ctx, prefix=ctx.prefix)
+    if title:
+        embed.title = title
+    if desc:
+        embed.description = desc
     return embed
 
 
-RARITY_DENOMINATOR = 100
+class LeaderboardMenu(menus.ListPageSource):
+    def __init__(self, data, ctx, embed_title, embed_footer):
+        super().__init__(data, per_page=10)
+        self.context = ctx
+        self.embed_title = embed_title
+        self.embed_footer = embed_footer
+
+    async def format_page(self, menu, entries):
+        embed = create_default_embed(self.context)
+        embed.title = self.embed_title
+        lines = [f'**#{rank}** {name} - Level {level} (`{xp}` XP)' for rank, _, name, level, xp in entries]
+        embed.description = '\n'.join(lines) or 'Nobody here has a character yet!'
+        embed.set_footer(text=f'Page {menu.current_page + 1}/{self.get_max_pages()}\n{self.embed_footer}')
+        return embed
 
 
-def get_random_item(possibles):
-    rand = random.random()
-    cumulative_probability = 0
-    for item in possibles:
-        cumulative_probability += item['rarity']/RARITY_DENOMINATOR
-        if rand <= cumulative_probability:
-            return item
+XP_EVENT_BATCH_SIZE = 1000
+
+# Seconds to wait before retrying a leaderboard load that failed, doubling up to the maximum
+LEADERBOARD_RETRY_DELAY = 5
+LEADERBOARD_MAX_RETRY_DELAY = 300
 
 
 class RPG(commands.Cog):
@@ -33,11 +64,57 @@ class RPG(commands.Cog):
         self.cdb = bot.mdb['rpg-characters-db']
         # fish db
         self.fish_db = bot.mdb['rpg-fish-db']
+        self.fish = FishCatalog(self.fish_db)
+        bot.loop.create_task(self.fish.load())
         # statistics db
         self.stats_db = bot.mdb['rpg-stats-db']
 
-    async def update_stat(self, _id: int, stat: str):
-        await self.stats_db.update_one({'_id': _id}, {'$inc': {stat: 1}}, upsert=True)
+        bot.indexes.declare_index('rpg-characters-db', 'owner_id', unique=True)
+        bot.indexes.declare_query('rpg-characters-db', {'owner_id': 0})
+        bot.indexes.declare_query('rpg-characters-db', {'owner_id': 0, 'name': ''})
+        bot.indexes.declare_index('rpg-fish-db', 'tier')
+        bot.indexes.declare_query('rpg-fish-db', {'tier': 1})
+        bot.indexes.declare_query('rpg-stats-db', {'_id': 0})
+
+        self.stats = CounterBuffer(self.stats_db, interval=config.STATS_FLUSH_INTERVAL)
+        bot.add_writer(self.stats)
+
+        self.leaderboard = Leaderboard(self.cdb)
+        bot.characters.listeners.append(self.leaderboard.on_character_change)
+        bot.loop.create_task(self.load_leaderboard())
+
+    def cog_unload(self):
+        self.bot.loop.create_task(self.bot.remove_writer(self.stats))
+        self.bot.characters.listeners.remove(self.leaderboard.on_character_change)
+
+    async def load_leaderboard(self):
+        """(Re)loads the leaderboard, retrying with backoff until the database answers."""
+        delay = LEADERBOARD_RETRY_DELAY
+        while True:
+            try:
+                # anything committed but not yet written would be missed by the load
+                await self.bot.characters.flush()
+                await self.leaderboard.load()
+                return
+            except PyMongoError:
+                log.exception(f'Could not load the leaderboard, retrying in {delay}s.')
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LEADERBOARD_MAX_RETRY_DELAY)
+
+    @commands.Cog.listener()
+    async def on_remote_character_change(self, owner_id: int, entry):
+        # another cluster wrote or deleted a character, entry is (name, level, xp) or None
+        if entry is None:
+            self.leaderboard.remove(owner_id)
+        else:
+            self.leaderboard.set_entry(owner_id, *entry)
+
+    @commands.Cog.listener()
+    async def on_remote_character_reset(self):
+        await self.load_leaderboard()
+
+    def update_stat(self, _id: int, stat: str):
+        self.stats.incr(_id, stat)
 
     @commands.group(name='rpg', invoke_without_command=True, aliases=['game', 'g'])
     async def rpg(self, ctx):
@@ -80,7 +157,7 @@ class RPG(commands.Cog):
 
         # Create a default character.
         char = Character.new(char_name, owner_id=ctx.author.id)
-        await char.commit(self.cdb)
+        self.bot.characters.commit(char)
         embed = create_default_embed(ctx)
         embed.title = 'Your character has been created!'
         embed.description = f'{char.name}\n{char.level_str()}'
@@ -103,15 +180,34 @@ class RPG(commands.Cog):
         )
         if not yes_or_no(confirm):
             return await ctx.send('Cancelling.', delete_after=10)
-        await self.cdb.delete_one({'owner_id': ctx.author.id})
+        await self.bot.characters.delete(ctx.author.id)
         return await ctx.send(embed=create_default_embed(ctx, title='Your character has been deleted.',
                                                          description=f'Say goodbye to {char.name}!'))
 
+    @rpg.command(name='leaderboard', aliases=['lb', 'top'])
+    async def rpg_leaderboard(self, ctx, scope: str = 'server'):
+        """Shows the top characters. Use `global` to see every character instead of just this server."""
+        if not self.leaderboard.loaded:
+            return await ctx.send('The leaderboard is still loading, try again in a moment.', delete_after=15)
+
+        if scope.lower() == 'global' or ctx.guild is None:
+            entries = self.leaderboard.view()
+            title = 'Global Leaderboard'
+        else:
+            entries = self.leaderboard.filtered(member.id for member in ctx.guild.members)
+            title = f'{ctx.guild.name} Leaderboard'
+
+        rank = self.leaderboard.rank(ctx.author.id)
+        footer = f'Your global rank: #{rank}' if rank else f'Create a character with {ctx.prefix}rpg setup'
+        source = LeaderboardMenu(entries, ctx, embed_title=title, embed_footer=footer)
+        menu = menus.MenuPages(source=source, clear_reactions_after=True)
+        await menu.start(ctx)
+
     # --------------------------
     # --    Work Commands     --
     # --------------------------
     @rpg.command(name='fish')
-    @commands.cooldown(1, 300, BucketType.user)
+    @shared_cooldown(300)
     async def rpg_fish(self, ctx):
         """Goes Fishing! Grants XP based on the tier of fish and the rarity of fish."""
         char: Character = await ctx.get_character()
@@ -119,14 +215,20 @@ class RPG(commands.Cog):
             return await ctx.send(embed=no_character_embed(ctx))
 
         # update stats
-        await self.update_stat(ctx.author.id, 'fishing')
+        self.update_stat(ctx.author.id, 'fishing')
 
         # get the fishies
         tier = char.get_stat('fishing') or 1
-        fishies = await self.fish_db.find({'tier': tier}).to_list(length=None)
+        table = await self.fish.get_table(tier)
 
         # which fishy for us?
-        fishy = get_random_item(fishies)
+        fishy = table.pick() if table else None
+        if fishy is None:
+            return await ctx.send(embed=create_default_embed(
+                ctx,
+                title=f'{char.name} goes Fishing!',
+                description=f'{char.name} goes fishing, but nothing bites.'
+            ))
 
         # xp is a function of rarity and character level
         xp = (fish_xp := ((100 - fishy['rarity'])*3)) * (level_xp := (1 + round(char.level/50, 2)))
@@ -137,7 +239,7 @@ class RPG(commands.Cog):
         elif not xp_result and xp_result is not None:
             level_str = f'\nLevel Down... You are now level {char.level}.'
 
-        await char.commit(self.cdb)
+        self.bot.characters.commit(char)
 
         embed = create_default_embed(ctx)
         embed.title = f'{char.name} goes Fishing!'
@@ -153,11 +255,7 @@ class RPG(commands.Cog):
 
     async def char_from_uid(self, uid: int) -> typing.Optional[Character]:
         """Fetches a character from someone's User ID."""
-        data = self.cdb.find_one({'owner_id': uid})
-        if data is None:
-            return None
-
-        return Character.from_dict(data)
+        return await self.bot.characters.get(uid)
 
     @commands.group(name='dev', invoke_without_subcommand=True, hidden=True)
     async def dev(self, ctx):
@@ -185,10 +283,63 @@ class RPG(commands.Cog):
                 embed.add_field(name='Level Up!', value=f'{who_char.name} is now level {who_char.level}')
             else:
                 embed.add_field(name='Level Down', value=f'{who_char.name} is now level {who_char.level}')
-        await who_char.commit(self.cdb)
+        self.bot.characters.commit(who_char)
 
         return await ctx.send(embed=embed)
 
+    @dev.command(name='xpevent')
+    @commands.is_owner()
+    async def dev_xpevent(self, ctx, amount: float):
+        """Gives (or takes away) XP from every character at once."""
+        confirm = await ctx.prompt(
+            title=f'Are you sure you want to give every character {amount:+} XP?',
+            description='This will modify every character in the database!'
+        )
+        if not yes_or_no(confirm):
+            return await ctx.send('Cancelling.', delete_after=10)
+
+        # write out anything pending first, so the event applies on top of it
+        await self.bot.characters.flush()
+
+        # characters committed during the scan are written on top of it once it is done
+        async with self.bot.characters.paused():
+            total = leveled = 0
+            batch = []
+            async for doc in self.cdb.find({}, {'level': True, 'xp': True}, batch_size=XP_EVENT_BATCH_SIZE):
+                batch.append(doc)
+                if len(batch) >= XP_EVENT_BATCH_SIZE:
+                    leveled += await self._apply_xp_batch(batch, amount)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                leveled += await self._apply_xp_batch(batch, amount)
+                total += len(batch)
+
+        await self.load_leaderboard()
+        self.bot.broadcast_characters(reset=True)
+        return await ctx.send(embed=create_default_embed(
+            ctx,
+            title='XP event applied!',
+            description=f'{total} characters were given `{amount:+}` XP. {leveled} of them changed level.'
+        ))
+
+    async def _apply_xp_batch(self, batch: list, amount: float) -> int:
+        levels, xps, changed = bulk_mod_xp([doc.get('level', 1) for doc in batch],
+                                           [doc.get('xp', 0) for doc in batch], amount)
+        operations = [UpdateOne({'_id': doc['_id']}, {'$set': {'level': level, 'xp': xp}})
+                      for doc, level, xp in zip(batch, levels.tolist(), xps.tolist())]
+        await self.cdb.bulk_write(operations, ordered=False)
+        return int((changed != 0).sum())
+
+    @dev.command(name='reloadfish')
+    @commands.is_owner()
+    async def dev_reloadfish(self, ctx):
+        """Reloads the fish catalog from the database."""
+        await self.fish.load()
+        tiers = ', '.join(f'{tier}: {len(table)}' for tier, table in sorted(self.fish.tables.items()))
+        return await ctx.send(embed=create_default_embed(ctx, title='Fish catalog reloaded!',
+                                                         description=f'Fish per tier: {tiers or "None"}'))
+
 
 def setup(bot):
     bot.add_cog(RPG(bot))
@@ -0,0 +1,185 @@
+import asyncio
+import collections.abc
+import itertools
+import logging
+import typing
+
+from sortedcontainers import SortedList
+
+log = logging.getLogger(__name__)
+
+# (rank, owner_id, name, level, xp)
+Entry = typing.Tuple[int, int, str, int, float]
+
+
+class Leaderboard:
+    def __init__(self, collection):
+        """
+        Every character, ranked by level and then XP.
+
+        Seeded from the database once with `load`, and then kept current with `update` and `remove`, which the
+        character cache calls whenever a character is committed or deleted. Rank lookups are O(log n) and
+        reading a page of k entries is O(log n + k).
+
+        :param collection: MotorIO async Mongo DB collection holding the characters.
+        """
+        self.collection = collection
+        # (-level, -xp, owner_id), so the best character sorts first
+        self._ranked = SortedList()
+        # owner_id -> (key in _ranked, name)
+        self._entries = dict()
+        self.loaded = False
+        # updates that arrive while any load is running or waiting, replayed after each load
+        self._buffered = None
+        # loads run one at a time, this counts the running one and those waiting for it
+        self._load_lock = asyncio.Lock()
+        self._loads = 0
+
+    def __len__(self):
+        return len(self._ranked)
+
+    async def load(self):
+        """(Re)builds the leaderboard from the database. If it fails, the current entries are kept."""
+        # buffering starts before waiting for another load, as that one's results could be older than this call
+        if self._buffered is None:
+            self._buffered = []
+        self._loads += 1
+        try:
+            async with self._load_lock:
+                try:
+                    entries = dict()
+                    projection = {'owner_id': True, 'name': True, 'level': True, 'xp': True}
+                    async for doc in self.collection.find({}, projection):
+                        owner_id = doc.get('owner_id')
+                        key = (-doc.get('level', 1), -doc.get('xp', 0), owner_id)
+                        entries[owner_id] = (key, doc.get('name', 'N/A'))
+                except BaseException:
+                    # what changed meanwhile still applies to the entries that are kept
+                    self._replay()
+                    raise
+
+                # no awaits from here on, so nothing can change between the swap and the replay
+                self._entries = entries
+                self._ranked = SortedList(key for key, _ in entries.values())
+                self._replay()
+                self.loaded = True
+        finally:
+            self._loads -= 1
+            if not self._loads and self._buffered is not None:
+                # cancelled while waiting for another load, which has already finished
+                self._replay()
+        log.info(f'Loaded {len(self)} characters into the leaderboard.')
+
+    def _replay(self):
+        buffered = self._buffered
+        # a load that is still waiting replaces the entries again, so it needs the updates as well
+        if self._loads <= 1:
+            self._buffered = None
+        for update in buffered:
+            update()
+
+    def update(self, char):
+        """
+        Moves a character to its current position.
+        :param Character char: The character that changed.
+        """
+        self.set_entry(char.owner_id, char.name, char.level, char.xp)
+
+    def set_entry(self, owner_id: int, name: str, level: int, xp: float):
+        """
+        Moves a character to the position for `level` and `xp`, for characters that are not in this process.
+        :param int owner_id: The ID of the owner.
+        :param str name: The character's name.
+        :param int level: The character's level.
+        :param float xp: The character's XP.
+        """
+        if self._buffered is not None:
+            # the load replaces everything when it finishes, so this only counts once replayed on top of it
+            self._buffered.append(lambda: self._set(owner_id, name, level, xp))
+            return
+        self._set(owner_id, name, level, xp)
+
+    def _set(self, owner_id: int, name: str, level: int, xp: float):
+        self._discard(owner_id)
+        key = (-level, -xp, owner_id)
+        self._ranked.add(key)
+        self._entries[owner_id] = (key, name)
+
+    def remove(self, owner_id: int):
+        """
+        Takes a character off the leaderboard.
+        :param int owner_id: The ID of the owner.
+        """
+        if self._buffered is not None:
+            self._buffered.append(lambda: self._discard(owner_id))
+            return
+        self._discard(owner_id)
+
+    def on_character_change(self, owner_id: int, char):
+        """Listener for CharacterCache, called with the character or None if it was deleted."""
+        if char is None:
+            self.remove(owner_id)
+        else:
+            self.update(char)
+
+    def _discard(self, owner_id: int):
+        old = self._entries.pop(owner_id, None)
+        if old is not None:
+            self._ranked.discard(old[0])
+
+    def _entry(self, rank: int, key: tuple) -> Entry:
+        level, xp, owner_id = key
+        return rank, owner_id, self._entries[owner_id][1], -level, -xp
+
+    def rank(self, owner_id: int) -> typing.Optional[int]:
+        """
+        Returns someone's 1-based rank, or None if they have no character.
+        :param int owner_id: The ID of the owner.
+        :rtype: int or None
+        """
+        entry = self._entries.get(owner_id)
+        if entry is None:
+            return None
+        return self._ranked.index(entry[0]) + 1
+
+    def page(self, start: int, count: int) -> typing.List[Entry]:
+        """
+        Returns `count` entries starting at the 0-based position `start`.
+        :rtype: list[tuple[int, int, str, int, float]]
+        """
+        keys = self._ranked.islice(start, start + count)
+        return [self._entry(rank, key) for rank, key in enumerate(keys, start=start + 1)]
+
+    def filtered(self, owner_ids: typing.Iterable[int]) -> typing.List[Entry]:
+        """
+        Returns the entries of the given owners, in order and with their global rank. O(m log n) for m owners, so
+        a server's leaderboard costs the same however many characters there are overall.
+        :param owner_ids: The owner IDs to include, those without a character are skipped.
+        :rtype: list[tuple[int, int, str, int, float]]
+        """
+        keys = sorted(entry[0] for entry in map(self._entries.get, owner_ids) if entry is not None)
+        return [self._entry(self._ranked.index(key) + 1, key) for key in keys]
+
+    def view(self):
+        """A read-only sequence of every entry, which only builds the entries that are sliced out of it."""
+        return LeaderboardView(self)
+
+
+class LeaderboardView(collections.abc.Sequence):
+    def __init__(self, leaderboard: Leaderboard):
+        self.leaderboard = leaderboard
+
+    def __len__(self):
+        return len(self.leaderboard)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            entries = self.leaderboard.page(start, max(stop - start, 0))
+            return list(itertools.islice(entries, 0, None, step))
+        if index < 0:
+            index += len(self)
+        entries = self.leaderboard.page(index, 1)
+        if not entries:
+            raise IndexError('leaderboard index out of range')
+        return entries[0]
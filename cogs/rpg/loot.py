@@ -0,0 +1,81 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import random
+import typing
+
+log = logging.getLogger(__name__)
+
+RARITY_DENOMINATOR = 100
+
+
+class LootTable:
+    def __init__(self, items: typing.List[dict], denominator: int = RARITY_DENOMINATOR):
+        """
+        Weighted table that picks an item in O(log n).
+
+        Each item's chance is `item['rarity'] / denominator`. If the chances add up to less than 1, the rest
+        of the time nothing is picked.
+
+        :param list[dict] items: The possible items, each with a `rarity`.
+        :param int denominator: What the rarities are out of.
+        """
+        self.items = items
+        self.cumulative = list(itertools.accumulate(item['rarity'] / denominator for item in items))
+
+    def __len__(self):
+        return len(self.items)
+
+    def pick(self, rand: float = None) -> typing.Optional[dict]:
+        """
+        Picks a random item from the table.
+        :param float rand: A number in [0, 1) to use instead of a random one.
+        :return: The item, or None if nothing was picked.
+        :rtype: dict or None
+        """
+        if rand is None:
+            rand = random.random()
+        index = bisect.bisect_left(self.cumulative, rand)
+        if index >= len(self.items):
+            return None
+        return self.items[index]
+
+
+class FishCatalog:
+    def __init__(self, collection):
+        """
+        Every fish, loaded once and grouped into a LootTable per tier.
+
+        :param collection: MotorIO async Mongo DB collection holding the fish.
+        """
+        self.collection = collection
+        self.tables = dict()
+        self.loaded = False
+        self._lock = asyncio.Lock()
+
+    async def load(self):
+        """(Re)loads every fish from the database."""
+        async with self._lock:
+            await self._load()
+
+    async def _load(self):
+        by_tier = dict()
+        async for fish in self.collection.find({}):
+            by_tier.setdefault(fish.get('tier'), []).append(fish)
+
+        self.tables = {tier: LootTable(fishies) for tier, fishies in by_tier.items()}
+        self.loaded = True
+        log.info(f'Loaded {sum(len(x) for x in self.tables.values())} fish across {len(self.tables)} tiers.')
+
+    async def get_table(self, tier: int) -> typing.Optional[LootTable]:
+        """
+        Returns the LootTable for a tier, loading the catalog first if needed.
+        :param int tier: The fishing tier.
+        :rtype: LootTable or None
+        """
+        if not self.loaded:
+            async with self._lock:
+                if not self.loaded:
+                    await self._load()
+        return self.tables.get(tier)
@@ -0,0 +1,82 @@
+import typing
+
+import numpy as np
+
+from .character import Character
+
+# These mirror xp_for_level, sum_of_squares and resolve_level_up/down in character.py, on whole arrays at once.
+
+
+def _sum_of_squares(n: np.ndarray) -> np.ndarray:
+    return n * (n + 1) * (2 * n + 1) // 6
+
+
+def _xp_between(start: np.ndarray, end: np.ndarray) -> np.ndarray:
+    return (_sum_of_squares(end) - _sum_of_squares(start)) * 200.0
+
+
+def _estimate_inverse(total: np.ndarray) -> np.ndarray:
+    return np.floor(np.cbrt(3 * total) - 0.5).astype(np.int64)
+
+
+def bulk_mod_xp(levels, xps, amounts) -> typing.Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Applies XP changes to many characters at once. Same results as calling `Character.mod_xp` on each.
+
+    :param levels: The current level of each character.
+    :param xps: The current XP of each character.
+    :param amounts: The XP to add to each character (or a single amount for all of them).
+    :return: The new levels, the new XP, and for each character 1 for a level up, -1 for a level down, 0 otherwise.
+    :rtype: tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
+    """
+    levels = np.asarray(levels, dtype=np.int64)
+    xps = np.asarray(xps, dtype=np.float64) + np.asarray(amounts, dtype=np.float64)
+    new_levels = levels.copy()
+    new_xps = xps.copy()
+    leveled = np.zeros(levels.shape, dtype=np.int8)
+
+    up = xps > (levels + 1) ** 2 * 200.0
+    if up.any():
+        level, xp = levels[up], xps[up]
+        top = _estimate_inverse(_sum_of_squares(level) + xp / 200) + 1
+        top = np.maximum(top, level + 1)
+        while (low := _xp_between(level, top) < xp).any():
+            top[low] += 1
+        while (high := (top - 1 > level) & (_xp_between(level, top - 1) >= xp)).any():
+            top[high] -= 1
+        new_levels[up] = top - 1
+        new_xps[up] = xp - _xp_between(level, top - 1)
+        leveled[up] = 1
+
+    down = xps < 0
+    if down.any():
+        level, xp = levels[down], xps[down]
+        bottom = _estimate_inverse(_sum_of_squares(level - 1) + xp / 200)
+        bottom = np.minimum(bottom, level - 2)
+        while (high := xp + _xp_between(bottom, level - 1) < 0).any():
+            bottom[high] -= 1
+        while (low := (bottom + 1 <= level - 2) & (xp + _xp_between(bottom + 1, level - 1) >= 0)).any():
+            bottom[low] += 1
+        new_levels[down] = bottom + 1
+        new_xps[down] = xp + _xp_between(bottom, level - 1)
+        leveled[down] = -1
+
+    return new_levels, np.round(new_xps, 3), leveled
+
+
+def apply_xp(characters: typing.List[Character], amounts) -> typing.List[typing.Optional[bool]]:
+    """
+    Applies XP changes to a list of characters in place.
+
+    :param list[Character] characters: The characters to modify.
+    :param amounts: The XP to add to each character (or a single amount for all of them).
+    :return: For each character, True for level up, None for no change, False for level down, like `mod_xp`.
+    :rtype: list[bool or None]
+    """
+    levels, xps, leveled = bulk_mod_xp([c.level for c in characters], [c.xp for c in characters], amounts)
+    out = []
+    for char, level, xp, direction in zip(characters, levels.tolist(), xps.tolist(), leveled.tolist()):
+        char._level = level
+        char._xp = xp
+        out.append({1: True, -1: False}.get(direction))
+    return out
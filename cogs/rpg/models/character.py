@@ -15,7 +15,61 @@ def xp_for_level(level: int):
     return (level ** LEVEL_CONSTANT) * 200
 
 
+# The closed-form level math below relies on LEVEL_CONSTANT being 2, so that the XP for a run of levels is a
+# sum of squares.
+def sum_of_squares(n: int) -> int:
+    """
+    1^2 + 2^2 + ... + n^2, extended to every integer so that `sum_of_squares(n) - sum_of_squares(n - 1) == n^2`.
+    """
+    return n * (n + 1) * (2 * n + 1) // 6
+
+
+def xp_between(start: int, end: int):
+    """The XP for levels `start + 1` through `end`, i.e. xp_for_level(start + 1) + ... + xp_for_level(end)."""
+    return (sum_of_squares(end) - sum_of_squares(start)) * 200
+
+
+def _estimate_sum_of_squares_inverse(total: float) -> int:
+    # sum_of_squares(n) == u^3 / 3 - u / 12 with u = n + 1/2, so n is about cbrt(3 * total) - 1/2
+    u = math.copysign(abs(3 * total) ** (1 / 3), total)
+    return math.floor(u - 0.5)
+
+
+def resolve_level_up(level: int, xp):
+    """
+    Resolves a level up in O(1). Same result as repeatedly paying xp_for_level(level + 1) while
+    `xp > xp_for_level(level + 1)`.
+    :return: The new level and the XP left over.
+    """
+    # the character ends up one below the first level `top` where xp_between(level, top) >= xp
+    top = _estimate_sum_of_squares_inverse(sum_of_squares(level) + xp / 200) + 1
+    top = max(top, level + 1)
+    while xp_between(level, top) < xp:
+        top += 1
+    while top - 1 > level and xp_between(level, top - 1) >= xp:
+        top -= 1
+    return top - 1, xp - xp_between(level, top - 1)
+
+
+def resolve_level_down(level: int, xp):
+    """
+    Resolves a level down in O(1). Same result as repeatedly getting back xp_for_level(level - 1) and going
+    down a level while `xp < 0`.
+    :return: The new level and the XP left over.
+    """
+    # going down to `bottom + 1` gives back xp_between(bottom, level - 1)
+    bottom = _estimate_sum_of_squares_inverse(sum_of_squares(level - 1) + xp / 200)
+    bottom = min(bottom, level - 2)
+    while xp + xp_between(bottom, level - 1) < 0:
+        bottom -= 1
+    while bottom + 1 <= level - 2 and xp + xp_between(bottom + 1, level - 1) >= 0:
+        bottom += 1
+    return bottom + 1, xp + xp_between(bottom, level - 1)
+
+
 class Character:
+    __slots__ = ('name', 'owner_id', '_level', '_xp', 'gold', 'inventory', '_synced')
+
     def __init__(self, name: str, owner_id: int,
                  level: int = 1, xp: int = 0, gold: int = 0,
                  inventory: Items.Inventory = None):
@@ -29,20 +83,17 @@ class Character:
             inventory = Items.Inventory(items=[])
         self.inventory = inventory
 
+        # the state last written to / read from the database, None if this character has never been saved
+        self._synced = None
+
     @classmethod
     def new(cls, name, owner_id):
-        rod = Items.Item(name='Old Fishing Rod', type_='fishing_rod', stats={
-            'fishing': 1
-        })
-        pick = Items.Item(name='Rusty Pickaxe', type_='Pickaxe', stats={
-            'mining': 1
-        })
-        inv = Items.Inventory(items=[rod, pick])
+        inv = Items.Inventory(items=[Items.OLD_FISHING_ROD, Items.RUSTY_PICKAXE])
         return cls(name, owner_id, inventory=inv)
 
     @classmethod
     def from_dict(cls, data):
-        return cls(
+        char = cls(
             name=data.get('name', 'N/A'),
             owner_id=data.get('owner_id', None),
             level=data.get('level', 1),
@@ -50,6 +101,8 @@ class Character:
             gold=data.get('gold', 0),
             inventory=Items.Inventory.from_dict(data.get('inventory', {'items': []}))
         )
+        char.mark_synced(char.sync_state())
+        return char
 
     def to_dict(self):
         return {
@@ -61,17 +114,107 @@ class Character:
             'inventory': self.inventory.to_dict()
         }
 
+    @property
+    def is_new(self) -> bool:
+        """Whether this character has never been saved to the database."""
+        return self._synced is None
+
+    def sync_state(self) -> dict:
+        """The values of every tracked field right now, to pass to `mark_synced` once they are written."""
+        return {
+            'name': self.name,
+            'level': self.level,
+            'xp': self.xp,
+            'gold': self.gold,
+            'inventory': self.inventory.version
+        }
+
+    def mark_synced(self, state: dict):
+        """
+        Records that the database now matches a state from `sync_state`.
+        :param dict state: The state that was written.
+        """
+        self._synced = state
+
+    def rebase(self, data: dict):
+        """
+        Puts the changes not yet saved on top of a newer version of this character's document, for when the
+        document was changed directly since it was loaded. The character then counts as loaded from `data`.
+        :param dict data: The character's current document.
+        """
+        synced = self._synced
+        if synced is None:
+            return
+        # the XP gained or lost since the last save, undoing any level changes it caused
+        if self.level >= synced['level']:
+            gained = xp_between(synced['level'], self.level)
+        else:
+            gained = -xp_between(self.level - 1, synced['level'] - 1)
+        gained += self.xp - synced['xp']
+        gold = self.gold - synced['gold']
+
+        saved = Character.from_dict(data)
+        state = saved.sync_state()
+        self._level, self._xp = saved.level, saved.xp
+        self.gold = saved.gold + gold
+        if gained:
+            self.mod_xp(gained)
+        if self.name == synced['name']:
+            self.name = saved.name
+        if self.inventory.version == synced['inventory']:
+            self.inventory = saved.inventory
+        else:
+            # versions are per Inventory object, so make sure the changed one is written
+            state['inventory'] = None
+        self.mark_synced(state)
+
+    def sync_filter(self) -> dict:
+        """The filter that matches this character's document, as it was last saved."""
+        if self.is_new:
+            return {'owner_id': self.owner_id, 'name': self.name}
+        return {'owner_id': self.owner_id, 'name': self._synced['name']}
+
+    def update_document(self) -> typing.Optional[dict]:
+        """
+        Builds a Mongo update with only the fields that changed since the character was loaded or last saved.
+        Numeric fields are sent as `$inc` deltas. New characters are sent whole.
+        :return: The update, or None if nothing changed.
+        :rtype: dict or None
+        """
+        if self.is_new:
+            return {'$set': self.to_dict()}
+
+        to_set = {}
+        to_inc = {}
+        for key in ('name', 'level'):
+            if getattr(self, key) != self._synced[key]:
+                to_set[key] = getattr(self, key)
+        for key in ('xp', 'gold'):
+            if delta := round(getattr(self, key) - self._synced[key], 3):
+                to_inc[key] = delta
+        if self.inventory.version != self._synced['inventory']:
+            to_set['inventory'] = self.inventory.to_dict()
+
+        update = {}
+        if to_set:
+            update['$set'] = to_set
+        if to_inc:
+            update['$inc'] = to_inc
+        return update or None
+
     async def commit(self, db):
         """
-        Commits the character to a database
+        Commits the fields that changed to a database
         :param db: MotorIO async Mongo DB collection
-        :return: Update result
+        :return: Update result, or None if nothing changed
         """
-        return await db.update_one(
-            {'owner_id': self.owner_id, 'name': self.name},
-            {'$set': self.to_dict()},
-            upsert=True
-        )
+        update = self.update_document()
+        if update is None:
+            return None
+        state = self.sync_state()
+        result = await db.update_one(self.sync_filter(), update, upsert=self.is_new)
+        self.mark_synced(state)
+        return result
 
     def get_stat(self, stat: str) -> int:
         """
@@ -80,11 +223,7 @@ class Character:
         :return: The total
         :rtype: int
         """
-        total = 0
-        for item in self.inventory.items:
-            if value := item.stats.get(stat):
-                total += value
-        return total
+        return self.inventory.get_stat(stat)
 
     @property
     def level(self):
@@ -109,14 +248,12 @@ class Character:
         self._xp = self._xp + amount
         out = None
         # level up every time our current XP is greater than the next amount.
-        while self._xp > (next_xp := xp_for_level(self._level + 1)):
-            self._xp -= next_xp
-            self._level += 1
+        if self._xp > xp_for_level(self._level + 1):
+            self._level, self._xp = resolve_level_up(self._level, self._xp)
             out = True
         # level down while we are below 0 xp, and add the XP from that previous level to our current XP
-        while self._xp < 0:
-            self._xp += xp_for_level(self._level - 1)
-            self._level -= 1
+        elif self._xp < 0:
+            self._level, self._xp = resolve_level_down(self._level, self._xp)
             out = False
         self._xp = round(self._xp, 3)
         return out
@@ -1,22 +1,74 @@
+import collections
+import types
 import typing
+import weakref
 
 
 class Item:
+    __slots__ = ('_name', '_type', '_stats', '__weakref__')
+
+    # (name, type, stats) -> Item, so identical items share one object
+    _templates = weakref.WeakValueDictionary()
+
     def __init__(self, name: str, type_: str, stats: dict):
         """
-        Class that holds the stats for an Item.
+        Class that holds the stats for an Item. Items are immutable, use `Item.get` to get the shared instance.
 
         :param str name: The User-friendly name of the item.
         :param str type_: The type of the item. (`fishing_rod`, `pickaxe`)
         :param dict stats: The stats of the item, in a dictionary.
         """
-        self.name = name
-        self.stats = stats
-        self.type = type_
+        self._name = name
+        self._stats = types.MappingProxyType(dict(stats))
+        self._type = type_
+
+    @staticmethod
+    def _key(name, type_, stats):
+        return name, type_, tuple(sorted(stats.items()))
+
+    @classmethod
+    def get(cls, name: str, type_: str, stats: dict):
+        """
+        Returns the shared Item with these values, creating it if it does not exist yet.
+
+        :param str name: The User-friendly name of the item.
+        :param str type_: The type of the item.
+        :param dict stats: The stats of the item, in a dictionary.
+        :rtype: Item
+        """
+        key = cls._key(name, type_, stats)
+        item = cls._templates.get(key)
+        if item is None:
+            item = cls(name, type_, stats)
+            cls._templates[key] = item
+        return item
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def type(self):
+        return self._type
+
+    @property
+    def stats(self):
+        return self._stats
+
+    def __eq__(self, other):
+        if not isinstance(other, Item):
+            return NotImplemented
+        return self._key(self.name, self.type, self.stats) == self._key(other.name, other.type, other.stats)
+
+    def __hash__(self):
+        return hash(self._key(self.name, self.type, self.stats))
+
+    def __repr__(self):
+        return f'<Item name={self.name!r} type={self.type!r} stats={dict(self.stats)!r}>'
 
     @classmethod
     def from_dict(cls, data):
-        return cls(
+        return cls.get(
             name=data.get('name', 'Error'),
             type_=data.get('type', 'Error'),
             stats=data.get('stats', {})
@@ -26,18 +78,56 @@ class Item:
         return {
             'name': self.name,
             'type': self.type,
-            'stats': self.stats
+            'stats': dict(self.stats)
         }
 
 
+# Starting Items
+OLD_FISHING_ROD = Item.get(name='Old Fishing Rod', type_='fishing_rod', stats={'fishing': 1})
+RUSTY_PICKAXE = Item.get(name='Rusty Pickaxe', type_='Pickaxe', stats={'mining': 1})
+
+
 class Inventory:
+    __slots__ = ('_items', '_totals', 'version')
+
     def __init__(self, items: typing.List[Item]):
         """
-        Holds a bunch of items.
+        Holds a bunch of items, and keeps a running total of their stats.
 
         :param list[Item] items:
         """
-        self.items = items
+        self._items = list(items)
+        self._totals = collections.Counter()
+        for item in self._items:
+            self._totals.update(item.stats)
+        # bumped on every change, so characters can tell whether the inventory needs to be saved
+        self.version = 0
+
+    @property
+    def items(self) -> typing.Tuple[Item, ...]:
+        """The items in the inventory. Use `add` and `remove` to change them."""
+        return tuple(self._items)
+
+    def add(self, item: Item):
+        """Adds an item to the inventory."""
+        self._items.append(item)
+        self._totals.update(item.stats)
+        self.version += 1
+
+    def remove(self, item: Item):
+        """Removes an item from the inventory. Raises ValueError if it is not in the inventory."""
+        self._items.remove(item)
+        self._totals.subtract(item.stats)
+        self.version += 1
+
+    def get_stat(self, stat: str) -> int:
+        """
+        Gets the total of a stat across every item.
+        :param str stat:
+        :return: The total
+        :rtype: int
+        """
+        return self._totals.get(stat, 0)
 
     @classmethod
     def from_dict(cls, data):
@@ -47,5 +137,5 @@ class Inventory:
 
     def to_dict(self):
         return {
-            'items': [item.to_dict() for item in self.items]
+            'items': [item.to_dict() for item in self._items]
         }
@@ -1,7 +1,6 @@
 from discord.ext import commands
 from datetime import datetime, timedelta
 from utils.functions import create_default_embed
-from config import PREFIX as BOT_PREFIX
 
 
 def time_to_readable(delta_uptime: timedelta):
@@ -50,20 +49,10 @@ class Utils(commands.Cog):
         """
         guild_id = str(ctx.guild.id)
         if to_change is None:
-            if guild_id in self.bot.prefixes:
-                prefix = self.bot.prefixes.get(guild_id, BOT_PREFIX)
-            else:
-                dbsearch = await self.bot.mdb['prefixes'].find_one({'guild_id': guild_id})
-                if dbsearch is not None:
-                    prefix = dbsearch.get('prefix', BOT_PREFIX)
-                else:
-                    prefix = BOT_PREFIX
-                self.bot.prefixes[guild_id] = prefix
+            prefix = await self.bot.prefixes.get(guild_id)
             return await ctx.send(f'No prefix specified to change. Current Prefix: `{prefix}`')
         else:
-            await ctx.bot.mdb['prefixes'].update_one({'guild_id': guild_id},
-                                                     {'$set': {'prefix': to_change}}, upsert=True)
-            ctx.bot.prefixes[guild_id] = to_change
+            await self.bot.prefixes.set(guild_id, to_change)
             return await ctx.send(f'Guild prefix updated to `{to_change}`')
 
 
@@ -7,9 +7,61 @@ MONGO_URL = os.getenv('DISCORD_MONGO_URL', '')
 MONGO_DB = os.getenv('MONGO_DB', 'testpoddodb')
 DEFAULT_STATUS = os.getenv('DISCORD_STATUS', f'{PREFIX}help for help.')
 
+# Seconds to collect invocation messages for before bulk deleting them
+DELETE_DELAY = float(os.getenv('DELETE_DELAY', '1.5'))
+
+# Sharding / Clustering
+# Total shards, leave unset to use the amount Discord recommends
+SHARD_COUNT = int(os.getenv('SHARD_COUNT')) if os.getenv('SHARD_COUNT') else None
+# Worker processes launcher.py spreads the shards across
+CLUSTER_COUNT = int(os.getenv('CLUSTER_COUNT', '1'))
+# Leave any guild joined past this many guilds (across all clusters), 0 to disable
+GUILD_LIMIT = int(os.getenv('GUILD_LIMIT', '90'))
+
+# Member Cache
+# 'full' caches every member, 'interacted' only members that have run a command, 'off' none at all.
+# The server leaderboard only lists members that are cached.
+MEMBER_CACHE = os.getenv('MEMBER_CACHE', 'full').lower()
+# Whether to request every guild's member list at startup, defaults to on for the 'full' policy only
+CHUNK_GUILDS = os.getenv('CHUNK_GUILDS', 'true' if MEMBER_CACHE == 'full' else 'false').lower() in ('true', '1', 'yes')
+MESSAGE_CACHE_SIZE = int(os.getenv('MESSAGE_CACHE_SIZE', '1000'))
+
+# Only import some cogs when one of their commands is first used, to start up faster
+LAZY_LOAD = os.getenv('LAZY_LOAD', 'false').lower() in ('true', '1', 'yes')
+
+# Prefix Cache
+PREFIX_CACHE_SIZE = int(os.getenv('PREFIX_CACHE_SIZE', '10000'))
+PREFIX_POLL_INTERVAL = int(os.getenv('PREFIX_POLL_INTERVAL', '60'))
+
+# Character Cache
+CHARACTER_CACHE_SIZE = int(os.getenv('CHARACTER_CACHE_SIZE', '5000'))
+CHARACTER_FLUSH_INTERVAL = int(os.getenv('CHARACTER_FLUSH_INTERVAL', '30'))
+
+# Cooldowns
+COOLDOWN_FLUSH_INTERVAL = int(os.getenv('COOLDOWN_FLUSH_INTERVAL', '10'))
+
+# Statistics
+STATS_FLUSH_INTERVAL = int(os.getenv('STATS_FLUSH_INTERVAL', '10'))
+
+# Metrics, written in the Prometheus text format to METRICS_PATH if set
+METRICS_PATH = os.getenv('METRICS_PATH')
+METRICS_INTERVAL = int(os.getenv('METRICS_INTERVAL', '30'))
+
+# Health checks, served over HTTP on HEALTH_HOST:HEALTH_PORT (0 disables, clusters add their ID to the port)
+HEALTH_HOST = os.getenv('HEALTH_HOST', '127.0.0.1')
+HEALTH_PORT = int(os.getenv('HEALTH_PORT', '8080'))
+# Seconds the event loop can be blocked before it is logged and the bot reports itself as unhealthy
+LOOP_LAG_THRESHOLD = float(os.getenv('LOOP_LAG_THRESHOLD', '0.5'))
+
 # Version
 VERSION = os.getenv('VERSION', 'testing')
 
 # Error Reporting
 SENTRY_URL = os.getenv('SENTRY_URL', None)
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'testing')
+
+# Error Deduplication
+# Repeats of an error (same command and exception type) within this many seconds are sent as one event
+ERROR_WINDOW = int(os.getenv('ERROR_WINDOW', '60'))
+# The maximum amount of error events sent per window
+ERROR_RATE_LIMIT = int(os.getenv('ERROR_RATE_LIMIT', '20'))
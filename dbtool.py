@@ -0,0 +1,204 @@
+"""
+Streams the bot's collections to and from files, for backups, migrations and seeding.
+
+    python dbtool.py export backups/2021-06-01
+    python dbtool.py export backups/2021-06-01 --format bson --collections rpg-characters-db
+    python dbtool.py import backups/2021-06-01 --mode upsert
+    python dbtool.py import backups/2021-06-01 --mode insert --drop
+
+Each collection is one file in the directory, `<collection>.jsonl.gz` (MongoDB extended JSON, one document per
+line) or `<collection>.bson.gz`. Documents are read and written in batches, so memory use stays bounded no matter
+how large a collection is.
+"""
+import argparse
+import asyncio
+import gzip
+import logging
+import os
+import sys
+import time
+
+import bson
+import motor.motor_asyncio
+from bson import json_util
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError
+
+import config
+
+handler = logging.StreamHandler(sys.stdout)
+handler.setFormatter(logging.Formatter('[{asctime}] [{levelname}] | {name}: {message}', style='{'))
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+logger.addHandler(handler)
+
+log = logging.getLogger('dbtool')
+
+COLLECTIONS = ('rpg-characters-db', 'rpg-fish-db', 'rpg-stats-db', 'prefixes')
+EXTENSIONS = {'jsonl': '.jsonl.gz', 'bson': '.bson.gz'}
+# Seconds between progress reports
+PROGRESS_INTERVAL = 5
+
+
+def write_jsonl(f, docs):
+    f.write(''.join(json_util.dumps(doc, json_options=json_util.RELAXED_JSON_OPTIONS) + '\n' for doc in docs)
+            .encode())
+
+
+def read_jsonl(f):
+    for line in f:
+        if line.strip():
+            yield json_util.loads(line)
+
+
+def write_bson(f, docs):
+    f.write(b''.join(bson.encode(doc) for doc in docs))
+
+
+def read_bson(f):
+    yield from bson.decode_file_iter(f)
+
+
+WRITERS = {'jsonl': write_jsonl, 'bson': write_bson}
+READERS = {'jsonl': read_jsonl, 'bson': read_bson}
+
+
+class Progress:
+    def __init__(self, action: str, collection: str, total: int = None):
+        """Logs how far a collection has got, every PROGRESS_INTERVAL seconds."""
+        self.action = action
+        self.collection = collection
+        self.total = total
+        self.count = 0
+        self.start = self._last_report = time.perf_counter()
+
+    def add(self, amount: int):
+        self.count += amount
+        now = time.perf_counter()
+        if now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            self.report()
+
+    def report(self, done: bool = False):
+        elapsed = time.perf_counter() - self.start
+        rate = self.count / elapsed if elapsed else 0
+        of_total = f'/{self.total}' if self.total else ''
+        status = 'Finished' if done else self.action.capitalize()
+        log.info(f'{status} {self.collection}: {self.count}{of_total} documents in {elapsed:.1f}s '
+                 f'({rate:.0f} docs/s)')
+
+
+def find_file(directory: str, collection: str):
+    """Returns (path, format) of a collection's file in a directory, or (None, None)."""
+    for file_format, extension in EXTENSIONS.items():
+        path = os.path.join(directory, collection + extension)
+        if os.path.exists(path):
+            return path, file_format
+    return None, None
+
+
+async def export_collection(db, collection: str, directory: str, file_format: str, batch_size: int):
+    path = os.path.join(directory, collection + EXTENSIONS[file_format])
+    write = WRITERS[file_format]
+    progress = Progress('exporting', collection, await db[collection].estimated_document_count())
+
+    batch = []
+    # written to a temporary file first, so an interrupted export never looks like a complete one
+    with gzip.open(path + '.tmp', 'wb') as f:
+        async for doc in db[collection].find({}, batch_size=batch_size):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                write(f, batch)
+                progress.add(len(batch))
+                batch = []
+        write(f, batch)
+        progress.add(len(batch))
+    os.replace(path + '.tmp', path)
+    progress.report(done=True)
+
+
+async def write_batch(db, collection: str, batch: list, mode: str) -> int:
+    """Writes a batch of documents, returning how many failed."""
+    try:
+        if mode == 'insert':
+            await db[collection].insert_many(batch, ordered=False)
+        else:
+            await db[collection].bulk_write([ReplaceOne({'_id': doc['_id']}, doc, upsert=True) for doc in batch],
+                                            ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        log.warning(f'{len(errors)} documents in a batch for {collection} failed, '
+                    f'first error: {errors[0]["errmsg"] if errors else e}')
+        return len(errors)
+    return 0
+
+
+async def import_collection(db, collection: str, directory: str, batch_size: int, mode: str, drop: bool):
+    path, file_format = find_file(directory, collection)
+    if path is None:
+        log.warning(f'No file for {collection} in {directory}, skipping.')
+        return
+    if drop:
+        await db[collection].drop()
+        log.info(f'Dropped {collection}.')
+
+    progress = Progress('importing', collection)
+    failed = 0
+    pending = None
+    batch = []
+
+    async def flush(to_write: list):
+        nonlocal failed
+        failed += await write_batch(db, collection, to_write, mode)
+        progress.add(len(to_write))
+
+    with gzip.open(path, 'rb') as f:
+        for doc in READERS[file_format](f):
+            batch.append(doc)
+            if len(batch) < batch_size:
+                continue
+            # read the next batch while this one is written, with at most one write in flight
+            if pending is not None:
+                await pending
+            pending = asyncio.ensure_future(flush(batch))
+            batch = []
+            # give the write a chance to be sent before reading on
+            await asyncio.sleep(0)
+    if pending is not None:
+        await pending
+    if batch:
+        await flush(batch)
+
+    progress.report(done=True)
+    if failed:
+        log.warning(f'{failed} documents could not be imported into {collection}.')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Exports and imports the bot\'s collections.')
+    parser.add_argument('action', choices=('export', 'import'))
+    parser.add_argument('directory', help='Directory the collection files are written to or read from.')
+    parser.add_argument('--collections', nargs='+', default=COLLECTIONS, help='Collections to export or import.')
+    parser.add_argument('--format', choices=tuple(EXTENSIONS), default='jsonl', help='File format to export to.')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Documents per cursor batch and write.')
+    parser.add_argument('--mode', choices=('insert', 'upsert'), default='upsert',
+                        help='insert adds documents and skips existing _ids, upsert replaces them.')
+    parser.add_argument('--drop', action='store_true', help='Drop each collection before importing it.')
+    parser.add_argument('--url', default=config.MONGO_URL, help='Mongo connection URL.')
+    parser.add_argument('--db', default=config.MONGO_DB, help='Database name.')
+    args = parser.parse_args()
+
+    db = motor.motor_asyncio.AsyncIOMotorClient(args.url)[args.db]
+    start = time.perf_counter()
+    if args.action == 'export':
+        os.makedirs(args.directory, exist_ok=True)
+        for collection in args.collections:
+            await export_collection(db, collection, args.directory, args.format, args.batch_size)
+    else:
+        for collection in args.collections:
+            await import_collection(db, collection, args.directory, args.batch_size, args.mode, args.drop)
+    log.info(f'Done in {time.perf_counter() - start:.1f}s.')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,124 @@
+"""
+Runs the bot as several clusters, each a separate process holding a range of shards.
+
+    CLUSTER_COUNT=4 SHARD_COUNT=16 python launcher.py
+
+Clusters talk to each other through a local IPC hub run by this process, see utils/ipc.py. A cluster that exits
+is restarted.
+
+Each cluster has its own character cache and leaderboard. Clustered, characters are written as soon as they are
+committed and the other clusters are told over IPC to drop their copy and move the character on their leaderboard.
+That leaves a window of one Mongo round trip: if the same user runs commands on two clusters at once, for example
+in two servers on different shards, one cluster can act on a character the other has just changed. Numeric fields
+are written as deltas so neither change is lost, but checks like "enough gold" can pass on both. The help cache is
+per cluster as well, and is rebuilt when `reload` runs on every cluster.
+"""
+import asyncio
+import logging
+import multiprocessing
+import secrets
+import signal
+import sys
+
+import discord
+
+import config
+from cluster import run_cluster
+from utils.ipc import IPCServer
+
+handler = logging.StreamHandler(sys.stdout)
+handler.setFormatter(logging.Formatter('[{asctime}] [{levelname}] | {name}: {message}', style='{'))
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+logger.addHandler(handler)
+
+log = logging.getLogger('launcher')
+
+# Seconds between checks on the worker processes
+MONITOR_INTERVAL = 5
+
+
+async def recommended_shard_count() -> int:
+    """Asks Discord how many shards the bot should be running."""
+    http = discord.http.HTTPClient()
+    try:
+        await http.static_login(config.TOKEN, bot=True)
+        shard_count, _ = await http.get_bot_gateway()
+    finally:
+        await http.close()
+    return shard_count
+
+
+def split_shards(shard_count: int, cluster_count: int) -> list:
+    """Splits shard IDs into `cluster_count` contiguous, near equal ranges."""
+    per_cluster, extra = divmod(shard_count, cluster_count)
+    ranges = []
+    start = 0
+    for i in range(cluster_count):
+        end = start + per_cluster + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return [x for x in ranges if x]
+
+
+class Launcher:
+    def __init__(self, shard_count: int, cluster_count: int):
+        self.shard_count = shard_count
+        self.shard_ranges = split_shards(shard_count, cluster_count)
+        self.ipc = IPCServer(secret=secrets.token_hex(16))
+        self.processes = dict()
+        self.closing = False
+        self._mp = multiprocessing.get_context('spawn')
+
+    def spawn(self, cluster_id: int):
+        process = self._mp.Process(
+            target=run_cluster,
+            args=(cluster_id, self.shard_ranges[cluster_id], self.shard_count, self.ipc.port, self.ipc.secret),
+            name=f'cluster-{cluster_id}'
+        )
+        process.start()
+        self.processes[cluster_id] = process
+        log.info(f'Started cluster {cluster_id} (PID {process.pid}) with shards {self.shard_ranges[cluster_id]}.')
+
+    async def run(self):
+        await self.ipc.start()
+        for cluster_id in range(len(self.shard_ranges)):
+            self.spawn(cluster_id)
+
+        while not self.closing:
+            await asyncio.sleep(MONITOR_INTERVAL)
+            for cluster_id, process in list(self.processes.items()):
+                if not process.is_alive() and not self.closing:
+                    log.warning(f'Cluster {cluster_id} exited with code {process.exitcode}, restarting.')
+                    self.spawn(cluster_id)
+
+    async def close(self):
+        self.closing = True
+        for process in self.processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes.values():
+            process.join(timeout=10)
+        await self.ipc.close()
+
+
+async def main():
+    shard_count = config.SHARD_COUNT or await recommended_shard_count()
+    cluster_count = max(1, min(config.CLUSTER_COUNT, shard_count))
+    log.info(f'Launching {shard_count} shards across {cluster_count} clusters.')
+
+    launcher = Launcher(shard_count, cluster_count)
+    loop = asyncio.get_event_loop()
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    runner = asyncio.ensure_future(launcher.run())
+    await stop.wait()
+    log.info('Shutting down clusters.')
+    runner.cancel()
+    await launcher.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -5,12 +5,15 @@ import discord
 
 import config
 from bot import PoddoBot, COGS
+from utils.ipc import IPCClient
 
-handler = logging.StreamHandler(sys.stdout)
-handler.setFormatter(logging.Formatter('[{asctime}] [{levelname}] | {name}: {message}', style='{'))
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
-logger.addHandler(handler)
+# spawned cluster workers re-run launcher.py as __mp_main__, which has already set up a handler
+if not logger.handlers:
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter('[{asctime}] [{levelname}] | {name}: {message}', style='{'))
+    logger.addHandler(handler)
 
 # Make discord logs a bit quieter
 logging.getLogger('discord.gateway').setLevel(logging.WARNING)
@@ -22,10 +25,46 @@ intents = discord.Intents(guilds=True, members=True, messages=True, reactions=Tr
 
 description = 'Dr Turtle\'s bot.'
 
-bot = PoddoBot(desc=description, intents=intents, allowed_mentions=discord.AllowedMentions.none())
+# policy -> function of the bot's intents returning its MemberCacheFlags
+MEMBER_CACHE_FLAGS = {
+    # everything the intents allow, which is discord.py's default
+    'full': discord.MemberCacheFlags.from_intents,
+    'interacted': lambda _: discord.MemberCacheFlags.none(),
+    'off': lambda _: discord.MemberCacheFlags.none(),
+}
 
-for cog in COGS:
-    bot.load_extension(cog)
 
-if __name__ == '__main__':
+def cache_options(intents: discord.Intents) -> dict:
+    """The discord.py caching options for the configured member cache policy."""
+    if config.MEMBER_CACHE not in MEMBER_CACHE_FLAGS:
+        raise ValueError(f'Unknown MEMBER_CACHE policy {config.MEMBER_CACHE!r}, '
+                         f'expected one of {", ".join(MEMBER_CACHE_FLAGS)}')
+    return {
+        'member_cache_flags': MEMBER_CACHE_FLAGS[config.MEMBER_CACHE](intents),
+        'chunk_guilds_at_startup': config.CHUNK_GUILDS,
+        'max_messages': config.MESSAGE_CACHE_SIZE or None,
+    }
+
+
+def create_bot(**options) -> PoddoBot:
+    """Creates the bot and loads every cog. Extra options are passed to PoddoBot."""
+    bot = PoddoBot(desc=description, intents=intents, allowed_mentions=discord.AllowedMentions.none(),
+                   **cache_options(intents), **options)
+
+    bot.load_extensions(COGS, lazy=config.LAZY_LOAD)
+    total = sum(x + y for x, y in bot.startup_report.values())
+    log.info(f'Loaded {len(bot.startup_report)} extensions in {total * 1000:.1f} ms'
+             f'{", deferring " + ", ".join(bot.lazy_extensions) if bot.lazy_extensions else ""}.')
+    return bot
+
+
+def run_cluster(cluster_id: int, shard_ids: list, shard_count: int, ipc_port: int, ipc_secret: str):
+    """Runs one cluster of shards. This is the entry point for worker processes started by launcher.py."""
+    log.info(f'Starting cluster {cluster_id} with shards {shard_ids} of {shard_count}.')
+    ipc = IPCClient(cluster_id, ipc_secret, port=ipc_port)
+    bot = create_bot(shard_ids=shard_ids, shard_count=shard_count, cluster_id=cluster_id, ipc=ipc)
     bot.run(config.TOKEN)
+
+
+if __name__ == '__main__':
+    create_bot(shard_count=config.SHARD_COUNT).run(config.TOKEN)
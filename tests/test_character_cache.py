@@ -0,0 +1,125 @@
+import asyncio
+import unittest
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from benchmarks.fakes import FakeCollection, FakeDatabase
+from cogs.rpg.cache import CharacterCache
+from cogs.rpg.models.character import Character
+
+
+def character_doc(owner_id: int, **fields) -> dict:
+    return dict({'owner_id': owner_id, 'name': f'Character {owner_id}', 'level': 1, 'xp': 0, 'gold': 0,
+                 'inventory': {'items': []}}, **fields)
+
+
+class FailingCollection(FakeCollection):
+    def __init__(self):
+        super().__init__('rpg-characters-db')
+        # (apply first, exception) raised by the next bulk_write
+        self.fail_next = None
+
+    async def bulk_write(self, operations, ordered: bool = True):
+        if self.fail_next is None:
+            return await super().bulk_write(operations, ordered)
+        (apply, error), self.fail_next = self.fail_next, None
+        if apply:
+            await super().bulk_write(operations, ordered)
+        raise error
+
+
+class CharacterCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.collection = FakeDatabase()['rpg-characters-db']
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def make_cache(self, **kwargs) -> CharacterCache:
+        # no start(), so nothing flushes unless a test asks it to
+        return CharacterCache(self.collection, **dict({'max_pending': 1000}, **kwargs))
+
+    def doc(self, owner_id: int) -> dict:
+        return next(x for x in self.collection.docs if x['owner_id'] == owner_id)
+
+    def test_commits_past_max_size_are_written(self):
+        cache = self.make_cache(max_size=3)
+        for owner_id in range(5):
+            cache.commit(Character.new(f'Character {owner_id}', owner_id))
+        self.run_async(cache.flush())
+        self.assertEqual(sorted(x['owner_id'] for x in self.collection.docs), list(range(5)))
+
+    def test_loaded_commits_past_max_size_are_written(self):
+        self.collection.docs.extend(character_doc(owner_id) for owner_id in range(5))
+        cache = self.make_cache(max_size=3)
+
+        async def gain_gold():
+            for owner_id in range(5):
+                char = await cache.get(owner_id)
+                char.gold += 10
+                cache.commit(char)
+            await cache.flush()
+
+        self.run_async(gain_gold())
+        self.assertEqual([self.doc(owner_id)['gold'] for owner_id in range(5)], [10] * 5)
+
+
+
+class CharacterCacheFailureTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.collection = FailingCollection()
+        self.collection.docs.append(character_doc(1, gold=100))
+        self.cache = CharacterCache(self.collection, max_pending=1000)
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def gain_gold(self, amount: int):
+        async def gain():
+            char = await self.cache.get(1)
+            char.gold += amount
+            self.cache.commit(char)
+        self.run_async(gain())
+
+    def flush(self, apply: bool = None, error: Exception = None):
+        if error is not None:
+            self.collection.fail_next = (apply, error)
+            with self.assertRaises(type(error)):
+                self.run_async(self.cache.flush())
+        else:
+            self.run_async(self.cache.flush())
+
+    def test_applied_write_is_not_resent(self):
+        self.gain_gold(10)
+        self.flush(apply=True, error=AutoReconnect('connection closed'))
+        self.gain_gold(5)
+        self.flush()
+        self.assertEqual(self.collection.docs[0]['gold'], 115)
+
+    def test_lost_write_is_resent(self):
+        self.gain_gold(10)
+        self.flush(apply=False, error=AutoReconnect('connection closed'))
+        self.flush()
+        self.assertEqual(self.collection.docs[0]['gold'], 110)
+
+    def test_permanent_write_error_is_dropped(self):
+        self.gain_gold(10)
+        error = BulkWriteError({'writeErrors': [{'index': 0, 'code': 11000, 'errmsg': 'duplicate key'}]})
+        self.flush(apply=False, error=error)
+        self.assertEqual(self.cache.pending, 0)
+        self.assertEqual(self.run_async(self.cache.get(1)).gold, 100)
+
+    def test_transient_write_error_is_retried(self):
+        self.gain_gold(10)
+        error = BulkWriteError({'writeErrors': [{'index': 0, 'code': 91, 'errmsg': 'shutting down'}]})
+        self.flush(apply=False, error=error)
+        self.flush()
+        self.assertEqual(self.collection.docs[0]['gold'], 110)
+
+
+if __name__ == '__main__':
+    unittest.main()
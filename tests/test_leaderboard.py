@@ -0,0 +1,76 @@
+import asyncio
+import unittest
+
+from pymongo.errors import AutoReconnect
+
+from benchmarks.fakes import FakeCollection
+from cogs.rpg.leaderboard import Leaderboard
+
+
+class FlakyCollection(FakeCollection):
+    def __init__(self, docs):
+        super().__init__('rpg-characters-db', docs)
+        self.fail = False
+        # set to pause finds until it is set
+        self.gate = None
+
+    def find(self, query: dict = None, projection=None, **kwargs):
+        cursor = super().find(query, projection, **kwargs)
+        iterate = cursor._iterate
+
+        async def gated():
+            if self.gate is not None:
+                await self.gate.wait()
+            if self.fail:
+                raise AutoReconnect('connection closed')
+            async for doc in iterate():
+                yield doc
+
+        cursor._iterate = gated
+        return cursor
+
+
+def doc(owner_id: int, level: int) -> dict:
+    return {'owner_id': owner_id, 'name': f'Character {owner_id}', 'level': level, 'xp': 0}
+
+
+class LeaderboardLoadTest(unittest.TestCase):
+    def test_failed_load_keeps_entries_and_updates(self):
+        async def run():
+            collection = FlakyCollection([doc(1, 5), doc(2, 3)])
+            leaderboard = Leaderboard(collection)
+            await leaderboard.load()
+
+            collection.fail = True
+            collection.gate = asyncio.Event()
+            load = asyncio.ensure_future(leaderboard.load())
+            await asyncio.sleep(0)
+            leaderboard.set_entry(3, 'Character 3', 9, 0)
+            collection.gate.set()
+            with self.assertRaises(AutoReconnect):
+                await load
+            return leaderboard
+
+        leaderboard = asyncio.run(run())
+        self.assertEqual([x[1] for x in leaderboard.page(0, 10)], [3, 1, 2])
+
+    def test_concurrent_loads_keep_every_update(self):
+        async def run():
+            collection = FlakyCollection([doc(1, 5)])
+            leaderboard = Leaderboard(collection)
+            collection.gate = asyncio.Event()
+            loads = [asyncio.ensure_future(leaderboard.load()) for _ in range(2)]
+            await asyncio.sleep(0)
+            leaderboard.set_entry(2, 'Character 2', 9, 0)
+            collection.gate.set()
+            await asyncio.sleep(0)
+            leaderboard.set_entry(3, 'Character 3', 1, 0)
+            await asyncio.gather(*loads)
+            return leaderboard
+
+        leaderboard = asyncio.run(run())
+        self.assertEqual([x[1] for x in leaderboard.page(0, 10)], [2, 1, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import asyncio
+import unittest
+
+from benchmarks.fakes import FakeCollection
+from utils.prefixes import PrefixStore
+
+
+class FakeChangeStream:
+    def __init__(self):
+        self.changes = asyncio.Queue()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.changes.get()
+
+
+class RacingCollection(FakeCollection):
+    """Changes a prefix right after each find has read the collection, like a command running during a load."""
+
+    def __init__(self, docs):
+        super().__init__('prefixes', docs)
+        self.streams = []
+
+    def watch(self, *args, **kwargs):
+        stream = FakeChangeStream()
+        self.streams.append(stream)
+        return stream
+
+    def find(self, query: dict = None, projection=None, **kwargs):
+        cursor = super().find(query, projection, **kwargs)
+        doc = self._first({'guild_id': '1'})
+        doc['prefix'] = '!'
+        for stream in self.streams:
+            stream.changes.put_nowait({'operationType': 'update', 'documentKey': {'_id': doc['_id']},
+                                       'fullDocument': dict(doc)})
+        return cursor
+
+
+class PrefixStoreTest(unittest.TestCase):
+    def test_change_during_load_is_applied(self):
+        async def run():
+            store = PrefixStore(RacingCollection([{'guild_id': '1', 'prefix': '?'}]), default='=')
+            store.start()
+            await asyncio.sleep(0.01)
+            store.stop()
+            return store.get_cached('1')
+
+        self.assertEqual(asyncio.run(run()), '!')
+
+
+if __name__ == '__main__':
+    unittest.main()
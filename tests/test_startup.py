@@ -0,0 +1,101 @@
+"""
+Smoke checks that the bot can be constructed with every supported configuration, without connecting anywhere.
+
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import config
+import main
+from bot import PoddoBot
+
+
+class BotTestCase(unittest.TestCase):
+    def build(self, policy: str, chunk: bool) -> PoddoBot:
+        loop = asyncio.new_event_loop()
+        self.addCleanup(self.close_loop, loop)
+        with mock.patch.object(config, 'MEMBER_CACHE', policy), mock.patch.object(config, 'CHUNK_GUILDS', chunk), \
+                mock.patch.object(config, 'MONGO_URL', 'mongodb://localhost:1'), \
+                mock.patch.object(config, 'HEALTH_PORT', 0), mock.patch.object(config, 'METRICS_PATH', None):
+            bot = PoddoBot(desc=main.description, intents=main.intents, loop=loop,
+                           **main.cache_options(main.intents))
+        self.addCleanup(bot.monitor.stop)
+        return bot
+
+    @staticmethod
+    def close_loop(loop):
+        # the bot schedules its background tasks on construction, which never got to run
+        tasks = asyncio.all_tasks(loop)
+        for task in tasks:
+            task.cancel()
+        loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        loop.close()
+
+
+class MemberCacheStartupTest(BotTestCase):
+    def test_every_policy(self):
+        for policy in main.MEMBER_CACHE_FLAGS:
+            for chunk in (True, False):
+                with self.subTest(policy=policy, chunk=chunk):
+                    bot = self.build(policy, chunk)
+                    flags = bot._connection.member_cache_flags
+                    self.assertEqual(flags.joined, policy == 'full')
+                    # needs the presences intent, which the bot does not ask for
+                    self.assertFalse(flags.online)
+
+    def test_unknown_policy(self):
+        with mock.patch.object(config, 'MEMBER_CACHE', 'everything'):
+            with self.assertRaises(ValueError):
+                main.cache_options(main.intents)
+
+
+
+EXTENSION = '''
+import time
+runs = globals().get('runs', 0) + 1
+time.sleep(0.02)
+
+
+def setup(bot):
+    time.sleep(0.01)
+'''
+
+
+class ExtensionLoadTest(BotTestCase):
+    def test_import_and_setup_are_timed_apart(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with open(os.path.join(directory.name, 'timed_extension.py'), 'w') as f:
+            f.write(EXTENSION)
+        sys.path.insert(0, directory.name)
+        self.addCleanup(sys.path.remove, directory.name)
+        self.addCleanup(sys.modules.pop, 'timed_extension', None)
+
+        bot = self.build('full', False)
+        bot.timed_load_extension('timed_extension')
+        imported, setup = bot.startup_report['timed_extension']
+        self.assertEqual(sys.modules['timed_extension'].runs, 1)
+        self.assertGreaterEqual(imported, 0.02)
+        self.assertGreaterEqual(setup, 0.01)
+        self.assertLess(setup, 0.02)
+
+    def test_lazy_stubs_copy_the_real_commands(self):
+        bot = self.build('full', False)
+        bot.load_extensions(['cogs.admin'], lazy=True)
+        self.assertEqual(bot.lazy_extensions, ['cogs.admin'])
+        self.assertEqual(bot.lazy_extension_for('Admin'), 'cogs.admin')
+        self.assertEqual(bot.get_command('admin').help, 'Owner-only commands for the bot.')
+
+        bot.load_lazy_extension(bot.lazy_extension_for('admin'))
+        self.assertEqual(bot.lazy_extensions, [])
+        self.assertEqual(bot.get_command('admin').cog_name, 'Admin')
+        self.assertIn('cogs.admin', bot.startup_report)
+
+
+if __name__ == '__main__':
+    unittest.main()
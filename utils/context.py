@@ -1,8 +1,7 @@
 from discord.ext import commands
-import discord
 import asyncio
 from cogs.rpg.models.character import Character
-from utils.functions import create_default_embed, try_delete
+from utils.functions import create_default_embed
 
 
 class PoddoContext(commands.Context):
@@ -13,10 +12,13 @@ class PoddoContext(commands.Context):
     async def get_character(self, db_name='rpg-characters-db'):
         """
         Returns the Character for the author of the message. Returns None if the character is not found.
+        Characters from the default database are served from the bot's character cache.
         :param db_name: The name of the database to use (Optional!)
         :return: The Character
         :rtype: Character
         """
+        if db_name == 'rpg-characters-db':
+            return await self.bot.characters.get(self.author.id)
 
         data = await self.bot.mdb[db_name].find_one({'owner_id': self.author.id})
         if data is None:
@@ -45,16 +47,13 @@ class PoddoContext(commands.Context):
         else:
             question = await self.channel.send(embed=embed)
 
-        def check(msg: discord.Message):
-            return msg.author.id == self.author.id and msg.channel.id == self.channel.id
-
         try:
-            result = await self.bot.wait_for('message', check=check, timeout=timeout)
+            result = await self.bot.prompts.wait(self.channel.id, self.author.id, timeout=timeout)
         except asyncio.TimeoutError:
             return None
 
         content = result.content
-        await try_delete(question)
-        await try_delete(result)
+        self.bot.deletions.schedule(question)
+        self.bot.deletions.schedule(result)
 
         return content or None
@@ -0,0 +1,192 @@
+import asyncio
+import datetime
+import heapq
+import logging
+import time
+import typing
+
+from discord.ext import commands
+from discord.ext.commands.cooldowns import BucketType
+from pymongo import DeleteOne, UpdateOne
+
+from utils.writers import BatchWriter
+
+log = logging.getLogger(__name__)
+
+
+def _to_datetime(timestamp: float) -> datetime.datetime:
+    return datetime.datetime.utcfromtimestamp(timestamp)
+
+
+def _to_timestamp(value: datetime.datetime) -> float:
+    return value.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class CooldownStore(BatchWriter):
+    def __init__(self, collection, interval: float = 10, max_pending: int = 200):
+        """
+        Per user cooldowns that survive restarts.
+
+        Expiries live in a dict for O(1) checks, with a heap of (expiry, key) to drop the expired ones. New
+        cooldowns are written to `collection` in batches and reloaded when the store starts. Documents carry an
+        `expires_at` date, so a TTL index on it lets Mongo clean up after us.
+
+        :param collection: MotorIO async Mongo DB collection holding the cooldowns.
+        :param float interval: Seconds between flushes.
+        :param int max_pending: The amount of unwritten cooldowns that triggers an early flush.
+        """
+        super().__init__(interval=interval, max_pending=max_pending)
+        self.collection = collection
+        # (name, user_id) -> unix timestamp the cooldown ends at
+        self._expiries = dict()
+        # (expiry, (name, user_id)), entries whose expiry no longer matches _expiries are stale
+        self._heap = []
+        # keys to write on the next flush
+        self._dirty = set()
+        self.loaded = False
+        # called with (name, user_id, expiry) whenever a cooldown is triggered here
+        self.listeners = []
+
+    def __len__(self):
+        return len(self._expiries)
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def start(self, loop=None):
+        loop = loop or asyncio.get_event_loop()
+        super().start(loop)
+        loop.create_task(self._safe_load())
+
+    async def _safe_load(self):
+        try:
+            await self.load()
+        except Exception:
+            log.exception('Could not load cooldowns.')
+
+    async def load(self):
+        """Loads every cooldown that has not ended yet. Anything already set in memory takes precedence."""
+        now = time.time()
+        count = 0
+        async for doc in self.collection.find({'expires_at': {'$gt': _to_datetime(now)}}):
+            self.set_expiry(doc['name'], doc['user_id'], _to_timestamp(doc['expires_at']))
+            count += 1
+        self.loaded = True
+        log.info(f'Loaded {count} cooldowns.')
+
+    def _prune(self, now: float):
+        while self._heap and self._heap[0][0] <= now:
+            expiry, key = heapq.heappop(self._heap)
+            if self._expiries.get(key) == expiry:
+                del self._expiries[key]
+                # ended before it was written, so there is nothing to write
+                self._dirty.discard(key)
+
+    def retry_after(self, name: str, user_id: int) -> float:
+        """
+        Returns how long is left on a cooldown.
+        :param str name: The name of the cooldown, usually the command's qualified name.
+        :param int user_id: The ID of the user.
+        :return: Seconds left, 0 if the cooldown is not active.
+        :rtype: float
+        """
+        expiry = self._expiries.get((name, user_id))
+        if expiry is None:
+            return 0.0
+        return max(0.0, expiry - time.time())
+
+    def set_expiry(self, name: str, user_id: int, expiry: float, persist: bool = False):
+        """
+        Sets when a cooldown ends, unless it already ends later.
+        :param str name: The name of the cooldown.
+        :param int user_id: The ID of the user.
+        :param float expiry: The unix timestamp it ends at.
+        :param bool persist: Whether to write it to the database.
+        """
+        key = (name, user_id)
+        if self._expiries.get(key, 0) >= expiry:
+            return
+        self._expiries[key] = expiry
+        heapq.heappush(self._heap, (expiry, key))
+        if persist:
+            self._dirty.add(key)
+            self.check_pending()
+
+    def trigger(self, name: str, user_id: int, per: float):
+        """
+        Starts a cooldown.
+        :param str name: The name of the cooldown.
+        :param int user_id: The ID of the user.
+        :param float per: How long it lasts, in seconds.
+        """
+        now = time.time()
+        self._prune(now)
+        expiry = now + per
+        self.set_expiry(name, user_id, expiry, persist=True)
+        for listener in self.listeners:
+            try:
+                listener(name, user_id, expiry)
+            except Exception:
+                log.exception(f'Cooldown listener {listener!r} failed.')
+
+    def reset(self, name: str, user_id: int):
+        """Ends a cooldown early."""
+        key = (name, user_id)
+        if self._expiries.pop(key, None) is not None:
+            self._dirty.add(key)
+            self.check_pending()
+
+    async def flush(self):
+        """Writes every new or reset cooldown in one bulk write."""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+
+        operations = []
+        for name, user_id in dirty:
+            _filter = {'_id': f'{name}:{user_id}'}
+            expiry = self._expiries.get((name, user_id))
+            if expiry is None:
+                operations.append(DeleteOne(_filter))
+            else:
+                operations.append(UpdateOne(_filter, {'$set': {
+                    'name': name, 'user_id': user_id, 'expires_at': _to_datetime(expiry)
+                }}, upsert=True))
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except Exception:
+            self._dirty |= dirty
+            raise
+        log.debug(f'Flushed {len(operations)} cooldowns.')
+
+
+def shared_cooldown(per: float, name: str = None):
+    """
+    A per user cooldown kept in the bot's CooldownStore, so it survives restarts and is shared between clusters.
+
+    Raises CommandOnCooldown like `commands.cooldown`, so the error handler treats both the same.
+
+    :param float per: The length of the cooldown, in seconds.
+    :param str name: The name of the cooldown, defaults to the command's qualified name. Commands with the same
+                     name share a cooldown.
+    """
+    cooldown = commands.Cooldown(1, per, BucketType.user)
+
+    def cooldown_name(ctx) -> str:
+        return name or ctx.command.qualified_name
+
+    # checked and triggered in a before_invoke hook rather than a check, as help runs checks to decide which
+    # commands to list, and its output is cached for everyone with the same permissions
+    async def hook(cog_or_ctx, ctx=None):
+        ctx = ctx or cog_or_ctx
+        store = ctx.bot.cooldowns
+        retry_after = store.retry_after(cooldown_name(ctx), ctx.author.id)
+        if retry_after:
+            raise commands.CommandOnCooldown(cooldown, retry_after)
+        store.trigger(cooldown_name(ctx), ctx.author.id, per)
+
+    def decorator(func: typing.Union[commands.Command, typing.Callable]):
+        return commands.before_invoke(hook)(func)
+
+    return decorator
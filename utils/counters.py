@@ -0,0 +1,61 @@
+import logging
+from collections import defaultdict, Counter
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from utils.writers import BatchWriter
+
+log = logging.getLogger(__name__)
+
+
+class CounterBuffer(BatchWriter):
+    def __init__(self, collection, interval: float = 10, max_pending: int = 500):
+        """
+        Buffers `$inc` updates in memory and writes them as one coalesced `bulk_write`.
+
+        :param collection: MotorIO async Mongo DB collection holding the counters.
+        :param float interval: Seconds between flushes.
+        :param int max_pending: The amount of buffered documents that triggers an early flush.
+        """
+        super().__init__(interval=interval, max_pending=max_pending)
+        self.collection = collection
+        # _id -> Counter of stat -> amount
+        self._counters = defaultdict(Counter)
+
+    @property
+    def pending(self) -> int:
+        return len(self._counters)
+
+    def incr(self, _id, stat: str, amount: int = 1):
+        """
+        Adds to a counter. The increment is written on the next flush.
+        :param _id: The _id of the document holding the counter.
+        :param str stat: The name of the counter.
+        :param int amount: How much to add.
+        """
+        self._counters[_id][stat] += amount
+        self.check_pending()
+
+    async def flush(self):
+        """Writes every buffered increment, one operation per document."""
+        if not self._counters:
+            return
+        counters, self._counters = self._counters, defaultdict(Counter)
+
+        items = list(counters.items())
+        operations = [UpdateOne({'_id': _id}, {'$inc': dict(stats)}, upsert=True) for _id, stats in items]
+        try:
+            await self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            # the operations that did go through must not be counted again
+            for error in e.details.get('writeErrors', []):
+                _id, stats = items[error['index']]
+                self._counters[_id].update(stats)
+            raise
+        except Exception:
+            # put the increments back so they are retried, on top of anything counted in the meantime
+            for _id, stats in counters.items():
+                self._counters[_id].update(stats)
+            raise
+        log.debug(f'Flushed counters for {len(operations)} documents.')
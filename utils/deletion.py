@@ -0,0 +1,84 @@
+import asyncio
+import datetime
+import logging
+
+import discord
+
+from utils.functions import try_delete
+
+log = logging.getLogger(__name__)
+
+# Discord refuses to bulk delete anything older than 14 days, keep some margin.
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=5)
+BULK_DELETE_MAX_COUNT = 100
+
+
+class DeletionQueue:
+    def __init__(self, delay: float = 1.5):
+        """
+        Collects messages to delete per channel and deletes them together with one bulk delete.
+
+        The first message scheduled in a channel starts a `delay` second window. Everything scheduled in that
+        channel during the window is deleted at once when it ends. Single deletes are only used when a bulk
+        delete is not possible (one message, a DM, missing Manage Messages, or a message that is too old).
+
+        :param float delay: Seconds to wait for more messages before deleting.
+        """
+        self.delay = delay
+        # channel_id -> {message_id: message}
+        self._pending = dict()
+        self._tasks = dict()
+
+    @property
+    def pending(self) -> int:
+        """The amount of messages waiting to be deleted."""
+        return sum(len(x) for x in self._pending.values())
+
+    def schedule(self, message: discord.Message):
+        """
+        Schedules a message for deletion.
+        :param discord.Message message: The message to delete.
+        """
+        channel_id = message.channel.id
+        self._pending.setdefault(channel_id, dict())[message.id] = message
+        if channel_id not in self._tasks:
+            self._tasks[channel_id] = asyncio.ensure_future(self._delete_later(message.channel))
+
+    async def flush(self):
+        """Deletes everything that is pending right away."""
+        for task in list(self._tasks.values()):
+            task.cancel()
+        self._tasks.clear()
+        channels = {channel_id: next(iter(x.values())).channel for channel_id, x in self._pending.items() if x}
+        await asyncio.gather(*(self._delete(channel) for channel in channels.values()))
+
+    async def _delete_later(self, channel):
+        await asyncio.sleep(self.delay)
+        self._tasks.pop(channel.id, None)
+        await self._delete(channel)
+
+    async def _delete(self, channel):
+        messages = list(self._pending.pop(channel.id, {}).values())
+        if not messages:
+            return
+
+        singles = messages
+        if len(messages) > 1 and self._can_bulk_delete(channel):
+            cutoff = datetime.datetime.utcnow() - BULK_DELETE_MAX_AGE
+            recent = [x for x in messages if x.created_at > cutoff]
+            singles = [x for x in messages if x.created_at <= cutoff]
+            for i in range(0, len(recent), BULK_DELETE_MAX_COUNT):
+                chunk = recent[i:i + BULK_DELETE_MAX_COUNT]
+                try:
+                    await channel.delete_messages(chunk)
+                except discord.HTTPException as e:
+                    log.debug(f'Bulk delete in {channel.id} failed ({e}), deleting one by one.')
+                    singles.extend(chunk)
+
+        for message in singles:
+            await try_delete(message)
+
+    def _can_bulk_delete(self, channel) -> bool:
+        if not isinstance(channel, discord.TextChannel):
+            return False
+        return channel.permissions_for(channel.guild.me).manage_messages
@@ -0,0 +1,107 @@
+import datetime
+import typing
+from collections import OrderedDict
+
+import discord
+
+DEFAULT_COLOUR = discord.Colour(0x2F3136)
+
+# Embed keyword arguments that map straight onto attributes
+_EMBED_ATTRIBUTES = {'title', 'description', 'url', 'type', 'timestamp', 'colour', 'color'}
+
+HEADER_CACHE_SIZE = 2048
+_headers = OrderedDict()
+
+
+def user_header(user) -> typing.Tuple[str, str]:
+    """
+    Returns the (name, icon url) pair used in embed authors and footers. Building an avatar URL is comparatively
+    expensive, so the result is cached per user until their name or avatar changes.
+    :param user: A discord.User or discord.Member.
+    :rtype: tuple[str, str]
+    """
+    key = (user.id, user.display_name, user.avatar)
+    header = _headers.get(key)
+    if header is not None:
+        _headers.move_to_end(key)
+        return header
+
+    header = (user.display_name, str(user.avatar_url))
+    _headers[key] = header
+    if len(_headers) > HEADER_CACHE_SIZE:
+        _headers.popitem(last=False)
+    return header
+
+
+class EmbedTemplate:
+    def __init__(self, title: str = None, description: str = None, colour: discord.Colour = DEFAULT_COLOUR,
+                 fields: typing.Iterable[typing.Tuple[str, str, bool]] = ()):
+        """
+        A prebuilt embed that is cloned and filled in for each reply.
+
+        `title` and `description` may contain `str.format` placeholders, filled in from the keyword arguments
+        given to `render`.
+
+        :param str title: The title of the embed.
+        :param str description: The description of the embed.
+        :param discord.Colour colour: The colour of the embed.
+        :param fields: (name, value, inline) tuples to add to the embed.
+        """
+        self.title = title
+        self.description = description
+        self.embed = discord.Embed(colour=colour)
+        for name, value, inline in fields:
+            self.embed.add_field(name=name, value=value, inline=inline)
+        # the attributes the prebuilt embed has set, so rendering can copy them without probing every slot
+        self._state = []
+        for slot in discord.Embed.__slots__:
+            if slot == '_fields':
+                continue
+            try:
+                self._state.append((slot, getattr(self.embed, slot)))
+            except AttributeError:
+                pass
+        # fields are mutable, so each render gets its own copy
+        self._fields = getattr(self.embed, '_fields', [])
+
+    def render(self, ctx, **values) -> discord.Embed:
+        """
+        Builds the embed for a context, with the author and bot headers.
+        :param ctx: The context the embed is for.
+        :param values: Values for the title and description placeholders.
+        :rtype: discord.Embed
+        """
+        embed = discord.Embed.__new__(discord.Embed)
+        for slot, value in self._state:
+            setattr(embed, slot, value)
+        if self._fields:
+            embed._fields = [dict(field) for field in self._fields]
+        if self.title is not None:
+            embed.title = self.title.format(**values) if values else self.title
+        if self.description is not None:
+            embed.description = self.description.format(**values) if values else self.description
+
+        name, icon_url = user_header(ctx.message.author)
+        embed.set_author(name=name, icon_url=icon_url)
+        bot_name, bot_icon_url = user_header(ctx.bot.user)
+        embed.set_footer(text=bot_name, icon_url=bot_icon_url)
+        embed.timestamp = datetime.datetime.utcnow()
+        return embed
+
+
+BASE_TEMPLATE = EmbedTemplate()
+
+
+def render_embed(ctx, template: EmbedTemplate = BASE_TEMPLATE, **options) -> discord.Embed:
+    """
+    Renders a template and then applies Embed keyword arguments (`title`, `description`, `colour`, ...) on top.
+    :param ctx: The context the embed is for.
+    :param EmbedTemplate template: The template to start from.
+    :rtype: discord.Embed
+    """
+    embed = template.render(ctx)
+    for key, value in options.items():
+        if key not in _EMBED_ATTRIBUTES:
+            raise TypeError(f'Unexpected embed option {key!r}')
+        setattr(embed, 'colour' if key == 'color' else key, value)
+    return embed
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+import typing
+
+import sentry_sdk
+
+log = logging.getLogger(__name__)
+
+
+class ErrorEvent:
+    __slots__ = ('fingerprint', 'error', 'tags', 'user', 'count')
+
+    def __init__(self, fingerprint: tuple, error: BaseException, tags: dict, user: dict):
+        self.fingerprint = fingerprint
+        self.error = error
+        self.tags = tags
+        self.user = user
+        # how many times this fingerprint happened since it was last sent
+        self.count = 1
+
+
+class ErrorReporter:
+    def __init__(self, dsn: str = None, environment: str = None, release: str = None, window: float = 60,
+                 rate_limit: int = 20, max_queue: int = 1000):
+        """
+        Reports command errors to Sentry (and the log) from a background worker.
+
+        Errors are fingerprinted by command and exception type. The first error of a fingerprint is sent right
+        away, repeats within `window` seconds are only counted and sent as one event with the count once the window
+        ends. At most `rate_limit` events are sent per window, the rest are counted and dropped. Capturing runs in
+        an executor, so the event loop only ever pays for the enqueue.
+
+        :param str dsn: The Sentry DSN, or None to only log errors.
+        :param str environment: Sentry environment name.
+        :param str release: Sentry release name.
+        :param float window: Seconds repeats of one fingerprint are collapsed over.
+        :param int rate_limit: The maximum amount of events sent per window.
+        :param int max_queue: The maximum amount of errors waiting for the worker. Errors past this are dropped.
+        """
+        self.dsn = dsn
+        self.environment = environment
+        self.release = release
+        self.window = window
+        self.rate_limit = rate_limit
+        self.max_queue = max_queue
+
+        self._queue = None
+        self._task = None
+        # fingerprint -> ErrorEvent, for fingerprints sent in the current window
+        self._recent = dict()
+        self._window_start = time.monotonic()
+        self._sent_in_window = 0
+        self.dropped = 0
+        self.sent = 0
+
+    def start(self, loop=None):
+        loop = loop or asyncio.get_event_loop()
+        if self.dsn:
+            sentry_sdk.init(self.dsn, environment=self.environment, release=self.release)
+        elif self.environment != 'testing':
+            log.warning('SENTRY Error Handling is not setup.')
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._task = loop.create_task(self._run())
+
+    async def close(self):
+        """Stops the worker, sending what is still waiting."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._queue is not None:
+            while not self._queue.empty():
+                to_send = self._add(self._queue.get_nowait())
+                if to_send is not None:
+                    await self._send(to_send)
+        await self._end_window()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def report(self, error: BaseException, ctx):
+        """
+        Queues a command error to be reported. Never blocks.
+        :param Exception error: The error.
+        :param ctx: The Context of the command that raised it.
+        """
+        command = ctx.command.qualified_name if ctx.command is not None else None
+        tags = {
+            'command': command,
+            'message.content': ctx.message.content,
+            'is_private_message': ctx.guild is None,
+            'channel.id': ctx.channel.id,
+            'channel.name': str(ctx.channel),
+        }
+        if ctx.guild is not None:
+            tags['guild.id'] = ctx.guild.id
+            tags['guild.name'] = str(ctx.guild)
+        user = {'id': ctx.author.id, 'username': str(ctx.author)}
+        event = ErrorEvent((command, type(error).__qualname__), error, tags, user)
+
+        if self._queue is None:
+            log.error(f'Error in command {command} before error reporting started.', exc_info=error)
+            return
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run(self):
+        while True:
+            timeout = max(0.0, self._window_start + self.window - time.monotonic())
+            try:
+                event = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self._end_window()
+                continue
+            to_send = self._add(event)
+            if to_send is not None:
+                await self._send(to_send)
+
+    def _add(self, event: ErrorEvent) -> typing.Optional[ErrorEvent]:
+        """Counts an event against its fingerprint. Returns it if it is the first of its window and can be sent."""
+        recent = self._recent.get(event.fingerprint)
+        if recent is not None:
+            recent.count += 1
+            return None
+        # remembered even when rate limited, so the repeats are counted and sent when the window ends
+        self._recent[event.fingerprint] = event
+        if self._sent_in_window >= self.rate_limit:
+            return None
+        self._sent_in_window += 1
+        # sent now, so only later repeats are counted for the end of the window
+        sent = ErrorEvent(event.fingerprint, event.error, event.tags, event.user)
+        event.count = 0
+        return sent
+
+    async def _end_window(self):
+        """Sends one event per fingerprint that repeated during the window, then starts a new window."""
+        repeated = [event for event in self._recent.values() if event.count]
+        self._recent = dict()
+        self._window_start = time.monotonic()
+        self._sent_in_window = 0
+
+        for event in repeated:
+            if self._sent_in_window >= self.rate_limit:
+                self.dropped += event.count
+                continue
+            self._sent_in_window += 1
+            await self._send(event)
+
+    async def _send(self, event: ErrorEvent):
+        loop = asyncio.get_event_loop()
+        try:
+            await loop.run_in_executor(None, self._capture, event)
+        except Exception:
+            log.exception('Could not report an error.')
+        self.sent += 1
+
+    def _capture(self, event: ErrorEvent):
+        command, error_type = event.fingerprint
+        if event.count > 1:
+            log.error(f'{error_type} in command {command} happened {event.count} times in the last '
+                      f'{self.window:.0f}s: {event.error}')
+        else:
+            log.error(f'Ignoring exception in command {command}:', exc_info=event.error)
+
+        if not self.dsn:
+            return
+        with sentry_sdk.push_scope() as scope:
+            scope.user = event.user
+            for key, value in event.tags.items():
+                scope.set_tag(key, value)
+            scope.set_tag('occurrences', event.count)
+            # group by command and exception type, not by stack trace
+            scope.fingerprint = [str(command), error_type]
+            sentry_sdk.capture_exception(event.error)
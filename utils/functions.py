@@ -1,5 +1,5 @@
 import discord
-from datetime import datetime
+from utils.embeds import render_embed
 __all__ = ('try_delete', 'create_default_embed', 'yes_or_no')
 
 
@@ -11,12 +11,7 @@ async def try_delete(message):
 
 
 def create_default_embed(ctx, **options) -> discord.Embed:
-    embed = discord.Embed(color=discord.Color(int('0x2F3136', base=16)), **options)
-    bot = ctx.bot
-    embed.set_author(name=ctx.message.author.display_name, icon_url=str(ctx.message.author.avatar_url))
-    embed.set_footer(text=bot.user.name, icon_url=str(bot.user.avatar_url))
-    embed.timestamp = datetime.utcnow()
-    return embed
+    return render_embed(ctx, **options)
 
 
 def yes_or_no(content):
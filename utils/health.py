@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+
+import psutil
+from aiohttp import web
+
+log = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 1, threshold: float = 0.5, latency=None):
+        """
+        Measures how late the event loop runs scheduled callbacks, and catches it when it is blocked.
+
+        A task sleeps for `interval` seconds at a time and records how much longer than that it took to wake up.
+        A watchdog thread checks that the task keeps waking up, and if it has not for `threshold` seconds past
+        `interval`, logs the stack of the loop thread so whatever is blocking it shows up in the logs.
+
+        :param float interval: Seconds between measurements.
+        :param float threshold: Seconds of lag that count as blocked.
+        :param latency: Callable returning the gateway latency in seconds, sampled every interval.
+        """
+        self.interval = interval
+        self.threshold = threshold
+        # seconds the last wake up was late by, and the worst so far
+        self.lag = 0.0
+        self.max_lag = 0.0
+        # how many times the loop has been blocked past the threshold
+        self.stalls = 0
+        self._latency = latency
+        # the last gateway latency sampled, None until the first heartbeat
+        self.gateway_latency = None
+
+        # None until the loop is running, so time spent starting up does not count as blocked
+        self._last_beat = None
+        self._loop_thread = None
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+
+    @property
+    def blocked_for(self) -> float:
+        """Seconds since the monitor task last ran, past the interval it was supposed to sleep."""
+        if self._last_beat is None:
+            return 0.0
+        return max(0.0, time.monotonic() - self._last_beat - self.interval)
+
+    @property
+    def stalled(self) -> bool:
+        return self.blocked_for > self.threshold or self.lag > self.threshold
+
+    def start(self, loop=None):
+        loop = loop or asyncio.get_event_loop()
+        # the watchdog is started by the task, once the loop is actually running
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._stopped.set()
+        self._watchdog = None
+        self._last_beat = None
+
+    async def _run(self):
+        self._loop_thread = threading.get_ident()
+        self._last_beat = time.monotonic()
+        if self._watchdog is None:
+            self._stopped.clear()
+            self._watchdog = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+            self._watchdog.start()
+        loop = asyncio.get_event_loop()
+        while True:
+            self._last_beat = time.monotonic()
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+            if self.lag > self.threshold:
+                log.warning(f'Event loop was blocked for {self.lag:.2f}s.')
+            if self._latency is not None:
+                latency = self._latency()
+                # nan until the first heartbeat
+                self.gateway_latency = latency if latency == latency else None
+
+    def _watch(self):
+        dumped = None
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._last_beat
+            if self.blocked_for <= self.threshold or dumped == beat:
+                continue
+            # only once per stall, the beat changes when the loop runs again
+            dumped = beat
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            self.stalls += 1
+            stack = ''.join(traceback.format_stack(frame))
+            log.warning(f'Event loop has been blocked for {self.blocked_for:.2f}s, it is running:\n{stack}')
+
+
+class HealthServer:
+    def __init__(self, bot, monitor: LoopMonitor, host: str = '127.0.0.1', port: int = 8080):
+        """
+        Small HTTP server with health checks, for Docker or an orchestrator to poll.
+
+        - `/live`: 200 while the event loop is responsive. A blocked loop cannot answer at all.
+        - `/ready`: 200 once the bot is connected to Discord and not shutting down.
+        - `/health`: JSON with loop lag, gateway latency, CPU and memory use.
+        - `/metrics`: the command and Mongo latency metrics in the Prometheus text format.
+
+        :param bot: The PoddoBot.
+        :param LoopMonitor monitor: The bot's loop monitor.
+        :param str host: The host to listen on. Keep this local.
+        :param int port: The port to listen on.
+        """
+        self.bot = bot
+        self.monitor = monitor
+        self.host = host
+        self.port = port
+        self.process = psutil.Process()
+        self._runner = None
+
+        self.app = web.Application()
+        self.app.router.add_get('/live', self.live)
+        self.app.router.add_get('/ready', self.ready)
+        self.app.router.add_get('/health', self.health)
+        self.app.router.add_get('/metrics', self.metrics)
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        try:
+            await site.start()
+        except OSError:
+            log.exception(f'Could not start the health server on {self.host}:{self.port}.')
+            return
+        log.info(f'Health server listening on {self.host}:{self.port}')
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _is_ready(self) -> bool:
+        return self.bot.is_ready() and not self.bot.is_closed()
+
+    async def live(self, request):
+        if self.monitor.stalled:
+            return web.Response(status=503, text=f'event loop lagging {self.monitor.lag:.2f}s')
+        return web.Response(text='ok')
+
+    async def ready(self, request):
+        if not self._is_ready():
+            return web.Response(status=503, text='not ready')
+        return web.Response(text='ok')
+
+    async def health(self, request):
+        with self.process.oneshot():
+            memory = self.process.memory_info()
+            cpu = self.process.cpu_percent()
+        body = {
+            'live': not self.monitor.stalled,
+            'ready': self._is_ready(),
+            'cluster_id': self.bot.cluster_id,
+            'uptime': self.bot.uptime.total_seconds(),
+            'loop_lag': self.monitor.lag,
+            'loop_max_lag': self.monitor.max_lag,
+            'loop_stalls': self.monitor.stalls,
+            'gateway_latency': self.monitor.gateway_latency,
+            # nan until a shard's first heartbeat, which JSON can not represent
+            'shard_latencies': {shard_id: x for shard_id, x in self.bot.latencies if x == x},
+            'guilds': len(self.bot.guilds),
+            'cpu_percent': cpu,
+            'rss': memory.rss,
+        }
+        return web.Response(text=json.dumps(body), content_type='application/json',
+                            status=200 if body['live'] else 503)
+
+    async def metrics(self, request):
+        text = self.bot.metrics.prometheus()
+        text += f'# TYPE poddo_loop_lag_seconds gauge\npoddo_loop_lag_seconds {self.monitor.lag}\n' \
+                f'# TYPE poddo_loop_stalls_total counter\npoddo_loop_stalls_total {self.monitor.stalls}\n' \
+                f'# TYPE poddo_gateway_latency_seconds gauge\n'
+        for shard_id, latency in self.bot.latencies:
+            if latency == latency:
+                text += f'poddo_gateway_latency_seconds{{shard="{shard_id}"}} {latency}\n'
+        return web.Response(text=text, content_type='text/plain')
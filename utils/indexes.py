@@ -0,0 +1,102 @@
+import asyncio
+import logging
+
+from pymongo.errors import PyMongoError
+
+log = logging.getLogger(__name__)
+
+
+def plan_stages(plan: dict) -> list:
+    """
+    Returns every stage name in an explained query plan, outermost first.
+    :param dict plan: A `winningPlan` from `explain`.
+    :rtype: list[str]
+    """
+    stages = []
+    to_visit = [plan]
+    while to_visit:
+        stage = to_visit.pop(0)
+        if 'stage' in stage:
+            stages.append(stage['stage'])
+        if 'inputStage' in stage:
+            to_visit.append(stage['inputStage'])
+        to_visit.extend(stage.get('inputStages', []))
+        # slot based engine plans (MongoDB 5+) nest the classic plan one level deeper
+        if 'queryPlan' in stage:
+            to_visit.append(stage['queryPlan'])
+    return stages
+
+
+class IndexRegistry:
+    def __init__(self, db):
+        """
+        Keeps track of the indexes and query shapes the bot relies on.
+
+        Indexes are created idempotently when `start` runs, and immediately for anything declared afterwards
+        (for example, by a cog that is reloaded).
+
+        :param db: MotorIO async Mongo database.
+        """
+        self.db = db
+        # (collection name, keys, create_index options)
+        self.indexes = []
+        # (collection name, filter)
+        self.queries = []
+        self._started = False
+
+    def declare_index(self, collection: str, keys, **options):
+        """
+        Declares an index that should exist.
+        :param str collection: The name of the collection.
+        :param keys: The keys, as accepted by `create_index`.
+        :param options: Extra options for `create_index`, like `unique=True`.
+        """
+        index = (collection, keys, options)
+        if index in self.indexes:
+            return
+        self.indexes.append(index)
+        if self._started:
+            asyncio.ensure_future(self._create(*index))
+
+    def declare_query(self, collection: str, query: dict):
+        """
+        Declares the shape of a query the bot runs, with example values, so it can be audited.
+        :param str collection: The name of the collection.
+        :param dict query: An example filter, such as `{'owner_id': 0}`.
+        """
+        shape = (collection, query)
+        if shape not in self.queries:
+            self.queries.append(shape)
+
+    def start(self, loop=None):
+        loop = loop or asyncio.get_event_loop()
+        loop.create_task(self.create_all())
+
+    async def _create(self, collection: str, keys, options: dict):
+        try:
+            name = await self.db[collection].create_index(keys, **options)
+        except PyMongoError:
+            log.exception(f'Could not create index {keys!r} on {collection}.')
+        else:
+            log.debug(f'Ensured index {name} on {collection}.')
+
+    async def create_all(self):
+        """Creates every declared index. Indexes that already exist are left alone."""
+        self._started = True
+        for index in list(self.indexes):
+            await self._create(*index)
+        log.info(f'Ensured {len(self.indexes)} indexes.')
+
+    async def audit(self) -> list:
+        """
+        Explains every declared query.
+        :return: A list of (collection name, filter, stages) tuples. A query is unindexed if 'COLLSCAN' is
+                 in its stages.
+        :rtype: list[tuple[str, dict, list[str]]]
+        """
+        out = []
+        for collection, query in self.queries:
+            explained = await self.db[collection].find(query).explain()
+            stages = plan_stages(explained.get('queryPlanner', {}).get('winningPlan', {}))
+            out.append((collection, query, stages))
+        return out
@@ -0,0 +1,210 @@
+import asyncio
+import itertools
+import json
+import logging
+import typing
+
+log = logging.getLogger(__name__)
+
+# How long the hub waits for every cluster to answer a request
+REQUEST_TIMEOUT = 5
+
+
+async def _send(writer: asyncio.StreamWriter, payload: dict):
+    writer.write(json.dumps(payload).encode() + b'\n')
+    await writer.drain()
+
+
+async def _receive(reader: asyncio.StreamReader) -> typing.Optional[dict]:
+    line = await reader.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+class IPCServer:
+    def __init__(self, secret: str, host: str = '127.0.0.1', port: int = 0):
+        """
+        The hub that cluster workers connect to. Runs in the launcher process.
+
+        Messages are newline delimited JSON over a local TCP socket. A request from one cluster is sent to
+        every cluster, and their answers are sent back to it together, keyed by cluster ID.
+
+        :param str secret: Shared secret every cluster has to identify with.
+        :param str host: The host to listen on. Keep this local.
+        :param int port: The port to listen on, 0 to pick a free one.
+        """
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self._server = None
+        # cluster_id -> StreamWriter
+        self.clusters = dict()
+        # call id -> (Future, {cluster_id: result}, expected cluster ids)
+        self._calls = dict()
+        self._ids = itertools.count()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        log.info(f'IPC hub listening on {self.host}:{self.port}')
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        hello = await _receive(reader)
+        if not hello or hello.get('op') != 'identify' or hello.get('secret') != self.secret:
+            writer.close()
+            return
+        cluster_id = hello['cluster_id']
+        self.clusters[cluster_id] = writer
+        log.info(f'Cluster {cluster_id} connected to IPC.')
+
+        try:
+            while (message := await _receive(reader)) is not None:
+                if message['op'] == 'request':
+                    asyncio.ensure_future(self._fan_out(writer, message))
+                elif message['op'] == 'reply':
+                    self._collect(message)
+        except (ConnectionError, json.JSONDecodeError):
+            log.exception(f'IPC connection to cluster {cluster_id} failed.')
+        finally:
+            if self.clusters.get(cluster_id) is writer:
+                del self.clusters[cluster_id]
+            writer.close()
+            log.info(f'Cluster {cluster_id} disconnected from IPC.')
+
+    async def _fan_out(self, origin: asyncio.StreamWriter, request: dict):
+        call_id = next(self._ids)
+        targets = dict(self.clusters)
+        future = asyncio.get_event_loop().create_future()
+        results = dict()
+        self._calls[call_id] = (future, results, set(targets))
+
+        call = {'op': 'call', 'id': call_id, 'command': request['command'], 'args': request.get('args', {})}
+        for writer in targets.values():
+            try:
+                await _send(writer, call)
+            except ConnectionError:
+                pass
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            del self._calls[call_id]
+
+        # JSON object keys are strings, so send the results as pairs
+        await _send(origin, {'op': 'response', 'id': request['id'], 'results': list(results.items())})
+
+    def _collect(self, reply: dict):
+        call = self._calls.get(reply['id'])
+        if call is None:
+            return
+        future, results, expected = call
+        results[reply['cluster_id']] = reply.get('result')
+        if expected <= results.keys() and not future.done():
+            future.set_result(None)
+
+
+class IPCClient:
+    def __init__(self, cluster_id: int, secret: str, host: str = '127.0.0.1', port: int = 0):
+        """
+        A cluster's connection to the IPC hub.
+
+        Register handlers with `handler`. They are called with the request's keyword arguments and their
+        (JSON serializable) return value is sent back to whoever asked.
+
+        :param int cluster_id: This cluster's ID.
+        :param str secret: The hub's shared secret.
+        :param str host: The host the hub listens on.
+        :param int port: The port the hub listens on.
+        """
+        self.cluster_id = cluster_id
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.handlers = dict()
+        self._writer = None
+        self._requests = dict()
+        self._ids = itertools.count()
+        self._task = None
+
+    def handler(self, name: str):
+        """Decorator that registers a coroutine function as the handler for a command."""
+        def decorator(func):
+            self.handlers[name] = func
+            return func
+        return decorator
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    def start(self, loop=None):
+        loop = loop or asyncio.get_event_loop()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                await _send(writer, {'op': 'identify', 'cluster_id': self.cluster_id, 'secret': self.secret})
+                self._writer = writer
+                while (message := await _receive(reader)) is not None:
+                    if message['op'] == 'call':
+                        asyncio.ensure_future(self._answer(message))
+                    elif message['op'] == 'response':
+                        future = self._requests.pop(message['id'], None)
+                        if future is not None and not future.done():
+                            future.set_result(dict(message['results']))
+            except (ConnectionError, OSError, json.JSONDecodeError) as e:
+                log.warning(f'IPC connection lost ({e}), reconnecting.')
+            finally:
+                self._writer = None
+                for future in self._requests.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError('IPC connection lost'))
+                self._requests.clear()
+            await asyncio.sleep(5)
+
+    async def _answer(self, call: dict):
+        handler = self.handlers.get(call['command'])
+        result = None
+        if handler is not None:
+            try:
+                result = await handler(**call.get('args', {}))
+            except Exception as e:
+                log.exception(f'IPC handler {call["command"]} failed.')
+                result = {'error': f'{e.__class__.__name__}: {e}'}
+        if self._writer is not None:
+            await _send(self._writer, {'op': 'reply', 'id': call['id'], 'cluster_id': self.cluster_id,
+                                       'result': result})
+
+    async def request(self, command: str, **args) -> typing.Dict[int, typing.Any]:
+        """
+        Runs a command on every cluster, this one included.
+        :param str command: The name of the handler to run.
+        :param args: Keyword arguments for the handler.
+        :return: cluster ID -> what that cluster's handler returned. Clusters that did not answer in time are missing.
+        :rtype: dict
+        """
+        if self._writer is None:
+            raise ConnectionError('Not connected to IPC.')
+        request_id = next(self._ids)
+        future = asyncio.get_event_loop().create_future()
+        self._requests[request_id] = future
+        try:
+            await _send(self._writer, {'op': 'request', 'id': request_id, 'command': command, 'args': args})
+            return await asyncio.wait_for(future, timeout=REQUEST_TIMEOUT * 2)
+        finally:
+            self._requests.pop(request_id, None)
@@ -0,0 +1,224 @@
+import asyncio
+import bisect
+import contextlib
+import logging
+import os
+import threading
+import typing
+
+from pymongo import monitoring
+
+log = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets. Anything slower lands in the last (+Inf) bucket.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Mongo commands that are connection housekeeping rather than work done for the bot
+IGNORED_MONGO_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'buildinfo', 'buildInfo', 'endSessions',
+                          'saslStart', 'saslContinue', 'getnonce', 'authenticate'}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets: typing.Sequence[float] = LATENCY_BUCKETS):
+        """
+        Fixed bucket histogram of durations, in the shape Prometheus expects.
+
+        :param buckets: Sorted upper bounds of the buckets, in seconds.
+        """
+        self.buckets = buckets
+        # the last count is the +Inf bucket
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile by interpolating inside the bucket it falls in.
+        :param float q: The quantile, between 0 and 1.
+        :return: The estimated value in seconds, 0 if nothing was observed.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                # the +Inf bucket has no upper bound, so report its lower one
+                upper = self.buckets[index] if index < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def prometheus_lines(self, name: str, labels: str) -> typing.List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {self.count}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+def _label(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MongoCommandTimer(monitoring.CommandListener):
+    def __init__(self, metrics: 'Metrics'):
+        """
+        pymongo command listener that times every command sent to Mongo, by collection and command.
+
+        Motor runs pymongo on a thread pool, so these callbacks happen off the event loop and only touch
+        state under the metrics lock.
+
+        :param Metrics metrics: Where the timings are recorded.
+        """
+        self.metrics = metrics
+        # (connection, request id) -> (collection, command)
+        self._started = dict()
+
+    def started(self, event):
+        if event.command_name in IGNORED_MONGO_COMMANDS:
+            return
+        target = event.command.get(event.command_name)
+        # most commands name their collection, getMore names a cursor and has the collection separately
+        collection = target if isinstance(target, str) else event.command.get('collection', '')
+        with self.metrics.lock:
+            self._started[(event.connection_id, event.request_id)] = (collection, event.command_name)
+
+    def _finish(self, event, failed: bool):
+        with self.metrics.lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+            if started is None:
+                return
+            self.metrics.record_mongo(*started, event.duration_micros / 1_000_000, failed)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+class Metrics:
+    def __init__(self):
+        """
+        Latency histograms for commands and Mongo operations.
+
+        Pass `mongo_listener` to the Mongo client's `event_listeners`, and record commands with
+        `record_command`. `prometheus()` renders everything in the Prometheus text format.
+        """
+        self.lock = threading.Lock()
+        # qualified command name -> Histogram
+        self.commands = dict()
+        self.command_errors = dict()
+        # (collection, mongo command) -> Histogram
+        self.mongo = dict()
+        self.mongo_errors = dict()
+        self.mongo_listener = MongoCommandTimer(self)
+        # lists that every Mongo command is also appended to, see `capture`
+        self._captures = []
+
+    def record_command(self, name: str, seconds: float, failed: bool = False):
+        with self.lock:
+            histogram = self.commands.get(name)
+            if histogram is None:
+                histogram = self.commands[name] = Histogram()
+            histogram.observe(seconds)
+            if failed:
+                self.command_errors[name] = self.command_errors.get(name, 0) + 1
+
+    def record_mongo(self, collection: str, command: str, seconds: float, failed: bool = False):
+        """Records a Mongo command. Callers must hold `lock`."""
+        key = (collection, command)
+        histogram = self.mongo.get(key)
+        if histogram is None:
+            histogram = self.mongo[key] = Histogram()
+        histogram.observe(seconds)
+        if failed:
+            self.mongo_errors[key] = self.mongo_errors.get(key, 0) + 1
+        for capture in self._captures:
+            capture.append((collection, command, seconds, failed))
+
+    @contextlib.contextmanager
+    def capture(self):
+        """
+        Collects every Mongo command that finishes inside the block.
+
+        Captures are process wide, so anything else running concurrently is collected as well.
+
+        :return: A list that fills with (collection, command, seconds, failed) tuples.
+        """
+        captured = []
+        with self.lock:
+            self._captures.append(captured)
+        try:
+            yield captured
+        finally:
+            with self.lock:
+                self._captures.remove(captured)
+
+    def snapshot(self) -> typing.Tuple[dict, dict]:
+        """Copies of the command and Mongo histograms, safe to read without the lock."""
+        with self.lock:
+            commands = {name: (h.count, h.quantile(0.5), h.quantile(0.95), self.command_errors.get(name, 0))
+                        for name, h in self.commands.items()}
+            mongo = {key: (h.count, h.quantile(0.5), h.quantile(0.95), self.mongo_errors.get(key, 0))
+                     for key, h in self.mongo.items()}
+        return commands, mongo
+
+    def prometheus(self) -> str:
+        """Renders every metric in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            lines.append('# HELP poddo_command_seconds Time taken to run a command.')
+            lines.append('# TYPE poddo_command_seconds histogram')
+            for name, histogram in self.commands.items():
+                lines.extend(histogram.prometheus_lines('poddo_command_seconds', f'command="{_label(name)}"'))
+            lines.append('# HELP poddo_command_errors_total Commands that raised an error.')
+            lines.append('# TYPE poddo_command_errors_total counter')
+            for name, count in self.command_errors.items():
+                lines.append(f'poddo_command_errors_total{{command="{_label(name)}"}} {count}')
+
+            lines.append('# HELP poddo_mongo_seconds Time taken by a Mongo command.')
+            lines.append('# TYPE poddo_mongo_seconds histogram')
+            for (collection, command), histogram in self.mongo.items():
+                labels = f'collection="{_label(collection)}",op="{_label(command)}"'
+                lines.extend(histogram.prometheus_lines('poddo_mongo_seconds', labels))
+            lines.append('# HELP poddo_mongo_errors_total Mongo commands that failed.')
+            lines.append('# TYPE poddo_mongo_errors_total counter')
+            for (collection, command), count in self.mongo_errors.items():
+                lines.append(f'poddo_mongo_errors_total{{collection="{_label(collection)}",op="{_label(command)}"}}'
+                             f' {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str):
+        """Writes the Prometheus text to a file, atomically, for node_exporter's textfile collector."""
+        temp = f'{path}.tmp'
+        with open(temp, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(temp, path)
+
+    async def write_every(self, path: str, interval: float):
+        """Writes the metrics file every `interval` seconds, forever."""
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(None, self.write, path)
+            except OSError:
+                log.exception(f'Could not write metrics to {path}.')
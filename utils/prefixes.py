@@ -0,0 +1,173 @@
+import asyncio
+import logging
+from collections import OrderedDict
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+log = logging.getLogger(__name__)
+
+# "The $changeStream stage is only supported on replica sets"
+CHANGE_STREAM_UNSUPPORTED = 40573
+
+
+class PrefixStore:
+    def __init__(self, collection, default: str, max_size: int = 10000, poll_interval: int = 60):
+        """
+        Bounded, preloaded cache of guild prefixes.
+
+        The whole collection is loaded in a single cursor at startup, and then kept up to date with a change
+        stream. If the server does not support change streams (a standalone mongod), the collection is reloaded
+        every `poll_interval` seconds instead.
+
+        :param collection: MotorIO async Mongo DB collection holding the prefixes.
+        :param str default: The prefix to use for guilds without a custom prefix.
+        :param int max_size: The maximum amount of guilds to keep in memory.
+        :param int poll_interval: Seconds between reloads when change streams are unavailable.
+        """
+        self.collection = collection
+        self.default = default
+        self.max_size = max_size
+        self.poll_interval = poll_interval
+
+        # guild_id -> prefix, in least to most recently used order
+        self._prefixes = OrderedDict()
+        # document _id -> guild_id, so deletes from the change stream can be resolved
+        self._doc_ids = dict()
+        # True while every custom prefix in the collection is held in memory, meaning a miss is the default
+        self._complete = False
+        self._watch_task = None
+
+    def __len__(self):
+        return len(self._prefixes)
+
+    def _store(self, guild_id: str, prefix: str, doc_id=None):
+        self._prefixes[guild_id] = prefix
+        self._prefixes.move_to_end(guild_id)
+        if doc_id is not None:
+            self._doc_ids[doc_id] = guild_id
+
+        while len(self._prefixes) > self.max_size:
+            _, evicted = self._prefixes.popitem(last=False)
+            if evicted != self.default:
+                # we no longer know every custom prefix, so misses have to go to the database again
+                self._complete = False
+
+    async def load(self):
+        """Loads every prefix document in one cursor."""
+        prefixes = OrderedDict()
+        doc_ids = dict()
+        count = 0
+        async for doc in self.collection.find({}, {'guild_id': True, 'prefix': True}):
+            count += 1
+            if count > self.max_size:
+                continue
+            guild_id = doc.get('guild_id')
+            prefixes[guild_id] = doc.get('prefix', self.default)
+            doc_ids[doc['_id']] = guild_id
+
+        self._prefixes = prefixes
+        self._doc_ids = doc_ids
+        self._complete = count <= self.max_size
+        log.info(f'Loaded {len(prefixes)} guild prefixes (complete: {self._complete}).')
+
+    def start(self, loop=None):
+        """Loads the collection and starts keeping it up to date in the background."""
+        loop = loop or asyncio.get_event_loop()
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = loop.create_task(self._run())
+
+    def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            self._watch_task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self._watch()
+            except PyMongoError as e:
+                if isinstance(e, OperationFailure) and e.code == CHANGE_STREAM_UNSUPPORTED:
+                    # change streams need a replica set, so fall back to polling the collection
+                    log.info(f'Prefix change streams are unavailable, polling every {self.poll_interval}s.')
+                    return await self._poll()
+
+                log.exception('Prefix change stream failed, reloading.')
+                self._complete = False
+                await asyncio.sleep(5)
+
+    async def _watch(self):
+        # the stream is opened before loading, so anything changed while the load runs is applied on top of it
+        async with self.collection.watch(full_document='updateLookup') as stream:
+            await self.load()
+            async for change in stream:
+                self._apply_change(change)
+
+    async def _poll(self):
+        while True:
+            try:
+                await self.load()
+            except PyMongoError:
+                log.exception('Could not load guild prefixes.')
+            await asyncio.sleep(self.poll_interval)
+
+    def _apply_change(self, change):
+        operation = change.get('operationType')
+        doc_id = change.get('documentKey', {}).get('_id')
+
+        if operation in ('insert', 'update', 'replace'):
+            doc = change.get('fullDocument')
+            if doc is None:
+                # the document was removed before the lookup happened, the delete event will follow
+                return
+            self._store(doc.get('guild_id'), doc.get('prefix', self.default), doc_id=doc_id)
+        elif operation == 'delete':
+            guild_id = self._doc_ids.pop(doc_id, None)
+            if guild_id is not None:
+                self._store(guild_id, self.default)
+        elif operation in ('drop', 'rename', 'invalidate'):
+            self._prefixes.clear()
+            self._doc_ids.clear()
+            self._complete = True
+
+    def get_cached(self, guild_id: str):
+        """
+        Returns the prefix for a guild without touching the database, or None if it is not known.
+        :param str guild_id: The ID of the guild, as a string.
+        :rtype: str or None
+        """
+        prefix = self._prefixes.get(guild_id)
+        if prefix is not None:
+            self._prefixes.move_to_end(guild_id)
+            return prefix
+        if self._complete:
+            return self.default
+        return None
+
+    async def get(self, guild_id: str) -> str:
+        """
+        Returns the prefix for a guild, looking it up in the database if it is not cached.
+        :param str guild_id: The ID of the guild, as a string.
+        :return: The prefix
+        :rtype: str
+        """
+        prefix = self.get_cached(guild_id)
+        if prefix is not None:
+            return prefix
+
+        result = await self.collection.find_one({'guild_id': guild_id})
+        if result is not None:
+            prefix = result.get('prefix', self.default)
+            self._store(guild_id, prefix, doc_id=result['_id'])
+        else:
+            prefix = self.default
+            self._store(guild_id, prefix)
+        return prefix
+
+    async def set(self, guild_id: str, prefix: str):
+        """
+        Changes the prefix for a guild.
+        :param str guild_id: The ID of the guild, as a string.
+        :param str prefix: The new prefix.
+        """
+        await self.collection.update_one({'guild_id': guild_id}, {'$set': {'prefix': prefix}}, upsert=True)
+        self._store(guild_id, prefix)
@@ -0,0 +1,61 @@
+import asyncio
+import typing
+
+import discord
+
+
+class PromptDispatcher:
+    def __init__(self):
+        """
+        Waits for replies to prompts, indexed by (channel ID, author ID).
+
+        `bot.wait_for('message', check=...)` runs every pending check against every message. Here, each
+        message is a single dict lookup, however many prompts are open.
+        """
+        # (channel_id, author_id) -> list of futures waiting for that author to talk in that channel
+        self._waiters = dict()
+
+    def __len__(self):
+        """The amount of open prompts."""
+        return sum(len(x) for x in self._waiters.values())
+
+    def open_prompts(self) -> typing.Dict[typing.Tuple[int, int], int]:
+        """Returns (channel ID, author ID) -> the amount of prompts open for them."""
+        return {key: len(futures) for key, futures in self._waiters.items()}
+
+    async def wait(self, channel_id: int, author_id: int, timeout: float = None) -> discord.Message:
+        """
+        Waits for the next message from an author in a channel.
+        :param int channel_id: The ID of the channel.
+        :param int author_id: The ID of the author.
+        :param float timeout: Seconds to wait before raising asyncio.TimeoutError.
+        :return: The message
+        :rtype: discord.Message
+        """
+        key = (channel_id, author_id)
+        future = asyncio.get_event_loop().create_future()
+        self._waiters.setdefault(key, []).append(future)
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            waiters = self._waiters.get(key)
+            if waiters is not None:
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    del self._waiters[key]
+
+    def dispatch(self, message: discord.Message) -> bool:
+        """
+        Hands a message to every prompt waiting on its author and channel, like wait_for would.
+        :param discord.Message message: The new message.
+        :return: Whether any prompt was waiting for it.
+        :rtype: bool
+        """
+        waiters = self._waiters.pop((message.channel.id, message.author.id), None)
+        if not waiters:
+            return False
+        for future in waiters:
+            if not future.done():
+                future.set_result(message)
+        return True
@@ -0,0 +1,70 @@
+import abc
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class BatchWriter(abc.ABC):
+    def __init__(self, interval: float, max_pending: int = 100):
+        """
+        Base class for anything that buffers database writes in memory and flushes them in the background.
+
+        Subclasses implement `pending` and `flush`. A flush runs every `interval` seconds, and early once
+        `max_pending` writes are waiting.
+
+        :param float interval: Seconds between flushes.
+        :param int max_pending: The amount of pending writes that triggers an early flush.
+        """
+        self.interval = interval
+        self.max_pending = max_pending
+        self._task = None
+        self._early_flush = None
+
+    @property
+    @abc.abstractmethod
+    def pending(self) -> int:
+        """The amount of writes waiting to be flushed."""
+
+    @abc.abstractmethod
+    async def flush(self):
+        """Writes everything that is pending to the database."""
+
+    def start(self, loop=None):
+        loop = loop or asyncio.get_event_loop()
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._run())
+
+    async def close(self):
+        """Stops the background task and flushes what is left."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    def check_pending(self):
+        """Schedules an early flush if too many writes are waiting. Call after adding a pending write."""
+        if self.pending < self.max_pending or self._task is None:
+            return
+        if self._early_flush is None or self._early_flush.done():
+            self._early_flush = asyncio.ensure_future(self._flush_early())
+
+    async def _flush_early(self):
+        # writes that arrive during a flush would otherwise wait for the next interval
+        while self.pending >= self.max_pending:
+            if not await self._safe_flush():
+                return
+
+    async def _safe_flush(self) -> bool:
+        try:
+            await self.flush()
+        except Exception:
+            # a flush that fails must not end the background task, or nothing would be written again
+            log.exception(f'{self.__class__.__name__} failed to flush, retrying next interval.')
+            return False
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._safe_flush()